@@ -0,0 +1,57 @@
+"""
+actions.py:
+
+Handles the compact action log kept by every game. Each action is three bytes (code, player, tile),
+so a whole game fits in well under a kilobyte and, together with the seed, is enough to rebuild any
+state (see replay.py). Draw actions store the tile that came off the wall, which lets a replay check
+that it is still drawing the same tiles.
+"""
+
+import struct
+
+DEAL = 0
+DRAW = 1 # Includes any bonus tiles and their replacements
+DISCARD = 2
+PONG = 3
+CHI = 4
+GANG = 5 # From a discard
+CONCEALED_GANG = 6
+ADDON_GANG = 7
+PASS_PONG = 8
+PASS_CHI = 9
+WIN = 10 # tile is the claimed discard, or NO_TILE for self-draw
+DRAW_GAME = 11
+CLAIM = 12 # A seat's answer to a claim window; tile is the claim's index in claims.CLAIM_KINDS
+
+ACTION_NAMES = [
+    "deal", "draw", "discard", "pong", "chi", "gang", "concealed_gang", "addon_gang",
+    "pass_pong", "pass_chi", "win", "draw_game", "claim"
+]
+
+NO_TILE = 255
+ACTION_SIZE = 3
+
+LOG_HEADER = struct.Struct("<QB") # Seed, bitmask of human seats
+
+def iter_actions(actions):
+    # (code, player, tile) for every action, with tile None where there was none
+    for i in range(0, len(actions), ACTION_SIZE):
+        code, player, tile = actions[i:i + ACTION_SIZE]
+        yield code, player, None if tile == NO_TILE else tile
+
+def pack_log(seed, human_players, actions):
+    # Seed, human seats and actions as one bytes object, for storage or shipping in an event log
+    humans = 0
+    for player_id in human_players:
+        humans |= 1 << (player_id - 1)
+    return LOG_HEADER.pack(seed, humans) + bytes(actions)
+
+def unpack_log(data):
+    seed, humans = LOG_HEADER.unpack_from(data)
+    human_players = [player_id for player_id in range(1, 5) if humans & (1 << (player_id - 1))]
+    return seed, human_players, data[LOG_HEADER.size:]
+
+def describe(actions):
+    # Readable form of an action log, one dict per action
+    return [{"action": ACTION_NAMES[code], "player": player, "tile": tile}
+            for code, player, tile in iter_actions(actions)]
@@ -0,0 +1,168 @@
+"""
+batch.py:
+
+Handles vectorised evaluation of many hands at once for analytics and bot training. Hands are
+2-D count arrays of shape (N, 34), one row per concealed hand (exposed melds are implied by the
+row's tile count, as in calculate_shanten). Results come from the same suit tables and block
+tables as rules.py, looked up with NumPy instead of one Python call per hand.
+
+NumPy is optional: the game server only imports this module for the vectorised bot policy, which
+is refused when NumPy is missing, and the functions below raise ImportError if it is not installed.
+"""
+
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from rules import GROUP_STARTS, GROUP_ENDS, SUIT_MELDS, SUIT_MELDS_PAIR, group_blocks
+from tiles import HONOR_START, NUM_TILE_TYPES
+
+MAX_MELDS = 4 # Enough for any hand of up to 14 tiles
+SUIT_SHAPES = 5 ** 9 # Suit shapes indexed as base-5 numbers (counts 0-4 per rank)
+
+SUIT_TABLES = None
+
+def require_numpy():
+    if np is None:
+        raise ImportError("batch.py needs NumPy (pip install numpy)")
+
+def as_counts(counts):
+    require_numpy()
+    counts = np.asarray(counts)
+    if counts.ndim != 2 or counts.shape[1] != NUM_TILE_TYPES:
+        raise ValueError(f"Expected counts of shape (N, {NUM_TILE_TYPES}), got {counts.shape}")
+    return counts.astype(np.int32)
+
+def shape_indices(counts, group):
+    # Base-5 index of every row's shape for one group
+    start, end = GROUP_STARTS[group], GROUP_ENDS[group]
+    return counts[:, start:end] @ (5 ** np.arange(end - start, dtype=np.int32))
+
+def suit_tables():
+    # SUIT_MELDS / SUIT_MELDS_PAIR as boolean arrays indexed by shape, built on first use
+    global SUIT_TABLES
+    if SUIT_TABLES is None:
+        powers = 5 ** np.arange(9)
+        melds = np.zeros(SUIT_SHAPES, dtype=bool)
+        pairs = np.zeros(SUIT_SHAPES, dtype=bool)
+        melds[[int(np.dot(list(shape), powers)) for shape in SUIT_MELDS]] = True
+        pairs[[int(np.dot(list(shape), powers)) for shape in SUIT_MELDS_PAIR]] = True
+        SUIT_TABLES = (melds, pairs)
+    return SUIT_TABLES
+
+# Win checks
+
+def check_win_batch(counts):
+    # Boolean array: whether each concealed hand splits into melds plus exactly one pair
+    counts = as_counts(counts)
+    melds, pairs = suit_tables()
+
+    valid = np.ones(len(counts), dtype=bool)
+    pair_count = np.zeros(len(counts), dtype=np.int32)
+    for group in range(3):
+        index = shape_indices(counts, group)
+        remainder = counts[:, GROUP_STARTS[group]:GROUP_ENDS[group]].sum(axis=1) % 3
+        has_pair = (remainder == 2) & pairs[index]
+        valid &= ((remainder == 0) & melds[index]) | has_pair
+        pair_count += has_pair
+
+    # Honors can only form Pongs or the pair
+    honors = counts[:, HONOR_START:]
+    valid &= np.isin(honors, (0, 2, 3)).all(axis=1)
+    pair_count += (honors == 2).sum(axis=1)
+    return valid & (pair_count == 1)
+
+# Shanten
+
+def block_table(indices, sequences):
+    # Best partial count for every (melds, pair) split of each distinct shape, as (U, MAX_MELDS + 1, 2)
+    size = 9 if sequences else NUM_TILE_TYPES - HONOR_START
+    table = np.full((len(indices), MAX_MELDS + 1, 2), -NUM_TILE_TYPES, dtype=np.int32)
+    for row, index in enumerate(indices.tolist()):
+        shape = bytes((index // 5 ** i) % 5 for i in range(size))
+        for (m, p), t in group_blocks(shape, sequences).items():
+            m = min(m, MAX_MELDS)
+            table[row, m, p] = max(table[row, m, p], t)
+    return table
+
+def shanten_batch(counts):
+    # Array of shanten numbers, matching calculate_shanten row by row
+    counts = as_counts(counts)
+    if (counts.sum(axis=1) > 14).any():
+        raise ValueError("Hands may hold at most 14 tiles")
+
+    combos = np.full((len(counts), MAX_MELDS + 1, 2), -NUM_TILE_TYPES, dtype=np.int32)
+    combos[:, 0, 0] = 0
+    for group in range(4):
+        indices, inverse = np.unique(shape_indices(counts, group), return_inverse=True)
+        blocks = block_table(indices, group < 3)[inverse.reshape(-1)]
+
+        # Max-plus merge of (melds, pair) splits, as merge_blocks does for one hand
+        merged = np.full_like(combos, -NUM_TILE_TYPES)
+        for m1 in range(MAX_MELDS + 1):
+            for m2 in range(MAX_MELDS + 1 - m1):
+                for p1 in range(2):
+                    for p2 in range(2 - p1):
+                        total = combos[:, m1, p1] + blocks[:, m2, p2]
+                        np.maximum(merged[:, m1 + m2, p1 + p2], total, out=merged[:, m1 + m2, p1 + p2])
+        combos = merged
+
+    needed = counts.sum(axis=1) // 3
+    best = 2 * needed
+    for m in range(MAX_MELDS + 1):
+        for p in range(2):
+            reachable = combos[:, m, p] >= 0
+            melds = np.minimum(m, needed)
+            shanten = 2 * (needed - melds) - np.minimum(combos[:, m, p], needed - melds) - p
+            best = np.where(reachable, np.minimum(best, shanten), best)
+    return best
+
+# Discards
+
+def best_discard_chunk(counts):
+    # Same choice as smart_discard: lowest shanten, then most ukeire, then the highest tile id
+    rows, tiles = np.nonzero(counts)
+    discards = counts[rows].copy()
+    discards[np.arange(len(rows)), tiles] -= 1
+    shanten = shanten_batch(discards)
+
+    # Ukeire: remaining copies of every draw that lowers the shanten of the hand after discarding
+    draws = np.repeat(discards, NUM_TILE_TYPES, axis=0)
+    drawn = np.tile(np.arange(NUM_TILE_TYPES), len(discards))
+    remaining = 4 - draws[np.arange(len(draws)), drawn]
+    draws[np.arange(len(draws)), drawn] += 1
+    improves = shanten_batch(np.where((remaining > 0)[:, None], draws, 0)) < np.repeat(shanten, NUM_TILE_TYPES)
+    ukeire = (np.where(improves & (remaining > 0), remaining, 0)).reshape(-1, NUM_TILE_TYPES).sum(axis=1)
+
+    # Sort candidates so the first per hand is the best, then pick it
+    order = np.lexsort((-tiles, -ukeire, shanten, rows))
+    rows, tiles, shanten, ukeire = rows[order], tiles[order], shanten[order], ukeire[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = rows[1:] != rows[:-1]
+
+    best_tiles = np.full(len(counts), -1, dtype=np.int32)
+    best_shanten = np.full(len(counts), -1, dtype=np.int32)
+    best_ukeire = np.zeros(len(counts), dtype=np.int32)
+    best_tiles[rows[first]] = tiles[first]
+    best_shanten[rows[first]] = shanten[first]
+    best_ukeire[rows[first]] = ukeire[first]
+    return best_tiles, best_shanten, best_ukeire
+
+def best_discard_batch(counts, chunksize=256, processes=None):
+    # (tiles, shanten, ukeire) arrays with smart_discard's choice for each hand, -1 for empty hands.
+    # Rows are evaluated in chunks to bound memory; processes > 1 spreads the chunks over a pool
+    counts = as_counts(counts)
+    chunks = [counts[i:i + chunksize] for i in range(0, len(counts), chunksize)]
+    if processes and processes > 1:
+        with Pool(processes) as pool:
+            results = pool.map(best_discard_chunk, chunks)
+    else:
+        results = [best_discard_chunk(chunk) for chunk in chunks]
+
+    if not results:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, empty, empty
+    return tuple(np.concatenate(parts) for parts in zip(*results))
@@ -0,0 +1,240 @@
+"""
+bench.py:
+
+Microbenchmarks for the rules, bot and game engine on a fixed, seeded corpus of hands
+(winning, non-winning, all-Pong, heavy exposed melds and near-win shapes), plus end-to-end
+bot games/sec. Each benchmark also records a digest of its results, so a baseline comparison
+catches rule changes as well as slowdowns.
+
+Usage:
+    python bench.py                          # run and print ns/op, peak bytes/op
+    python bench.py --save baseline.json     # save results as a baseline
+    python bench.py --compare baseline.json  # exit 1 on a slowdown past --tolerance or changed results
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from bot import smart_discard
+from cache import cache_stats, clear_caches
+from game import Game
+from player import Player
+from rules import (
+    calculate_shanten, can_concealed_gang, check_win, find_valid_chis, is_valid_group
+)
+from tiles import HONOR_START, NUM_TILE_TYPES, hand_from_tiles
+
+CORPUS_SEED = 2025
+CORPUS_SIZE = 200 # Hands per category
+
+# Corpus
+
+def add_meld(counts, tiles, rng):
+    # Adds a random Pong or Chi that still fits within 4 copies per tile
+    while True:
+        tile = rng.randrange(NUM_TILE_TYPES)
+        if tile < HONOR_START and tile % 9 <= 6 and rng.random() < 0.6:
+            meld = [tile, tile + 1, tile + 2]
+        else:
+            meld = [tile] * 3
+        if all(counts[t] + meld.count(t) <= 4 for t in set(meld)):
+            for t in meld:
+                counts[t] += 1
+            tiles.extend(meld)
+            return meld
+
+def winning_tiles(rng, melds=4, pongs_only=False):
+    counts = [0] * NUM_TILE_TYPES
+    tiles = []
+    pair = rng.randrange(NUM_TILE_TYPES)
+    counts[pair] += 2
+    tiles.extend([pair, pair])
+    for i in range(melds):
+        if pongs_only:
+            tile = rng.choice([t for t in range(NUM_TILE_TYPES) if counts[t] == 0])
+            counts[tile] += 3
+            tiles.extend([tile] * 3)
+        else:
+            add_meld(counts, tiles, rng)
+    return tiles
+
+def build_corpus():
+    rng = random.Random(CORPUS_SEED)
+    corpus = {"winning": [], "non_winning": [], "all_pong": [], "exposed": [], "near_win": []}
+    wall = [tile for tile in range(NUM_TILE_TYPES) for i in range(4)]
+
+    for i in range(CORPUS_SIZE):
+        corpus["winning"].append((hand_from_tiles(winning_tiles(rng)), []))
+        corpus["non_winning"].append((hand_from_tiles(rng.sample(wall, 14)), []))
+        corpus["all_pong"].append((hand_from_tiles(winning_tiles(rng, pongs_only=True)), []))
+
+        # Two or three melds already exposed; half of the concealed parts are winning
+        exposed_count = rng.choice([2, 3])
+        concealed = winning_tiles(rng, melds=4 - exposed_count)
+        if rng.random() < 0.5:
+            concealed[rng.randrange(len(concealed))] = rng.randrange(NUM_TILE_TYPES)
+        exposed = [[tile] * 3 for tile in rng.sample(range(HONOR_START, NUM_TILE_TYPES), exposed_count)]
+        corpus["exposed"].append((hand_from_tiles(concealed), exposed))
+
+        # Near-win shapes: nine-gates style single suits and winning hands with one tile swapped
+        if i % 2:
+            suit = rng.randrange(3) * 9
+            tiles = [suit, suit, suit] + list(range(suit + 1, suit + 8)) + [suit + 8] * 3 + [suit + rng.randrange(9)]
+        else:
+            tiles = winning_tiles(rng)
+            tiles[rng.randrange(14)] = rng.randrange(NUM_TILE_TYPES)
+        counts = hand_from_tiles(tiles)
+        if max(counts) > 4:
+            counts = hand_from_tiles(winning_tiles(rng))
+        corpus["near_win"].append((counts, []))
+    return corpus
+
+# Benchmarks
+
+def bench_function(name, func, cases, repeat):
+    # Times func over every case, and measures peak traced memory for one pass
+    results = [func(case) for case in cases]
+    digest = hashlib.sha1(repr(results).encode()).hexdigest()[:12]
+
+    # Caches are cleared before every pass so each benchmark measures the computation itself
+    elapsed = 0
+    for i in range(repeat):
+        clear_caches()
+        start = time.perf_counter_ns()
+        for case in cases:
+            func(case)
+        elapsed += time.perf_counter_ns() - start
+    ops = repeat * len(cases)
+
+    # Peak is measured above the memory already traced, so entries kept by earlier calls don't count
+    clear_caches()
+    tracemalloc.start()
+    peak = 0
+    for case in cases:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(case)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    return {"name": name, "ns_per_op": elapsed / ops, "peak_bytes_per_op": peak, "ops": ops, "digest": digest}
+
+def without_pair(counts):
+    # A 3k-tile hand for is_valid_group: drops the pair that leaves only melds if there is one,
+    # otherwise any pair, otherwise the two lowest tiles
+    pairs = [tile for tile in range(NUM_TILE_TYPES) if counts[tile] >= 2]
+    for pair in pairs:
+        melds = list(counts)
+        melds[pair] -= 2
+        if is_valid_group(melds):
+            return melds
+    melds = list(counts)
+    if pairs:
+        melds[pairs[0]] -= 2
+    else:
+        for tile in [tile for tile in range(NUM_TILE_TYPES) if melds[tile]][:2]:
+            melds[tile] -= 1
+    return melds
+
+def player_with_hand(counts):
+    player = Player(1)
+    for tile in range(NUM_TILE_TYPES):
+        for i in range(counts[tile]):
+            player.draw_tile(tile)
+    return player
+
+def run_benchmarks(repeat=20, games=20):
+    corpus = build_corpus()
+    all_hands = [case for cases in corpus.values() for case in cases]
+    thirteen = []
+    for counts, exposed in all_hands:
+        counts = list(counts)
+        counts[max(range(NUM_TILE_TYPES), key=counts.__getitem__)] -= 1
+        thirteen.append(counts)
+    melds_only = [without_pair(counts) for counts, exposed in all_hands]
+    players = [player_with_hand(counts) for counts, exposed in all_hands]
+
+    results = []
+    for category, cases in corpus.items():
+        results.append(bench_function(f"check_win[{category}]", lambda c: check_win(c[0], c[1]), cases, repeat))
+    results.append(bench_function("is_valid_group", lambda c: is_valid_group(c), melds_only, repeat))
+    results.append(bench_function("find_valid_chis", lambda c: [find_valid_chis(c, t) for t in range(0, 27, 4)], thirteen, repeat))
+    results.append(bench_function("can_concealed_gang", lambda c: can_concealed_gang(c[0]), all_hands, repeat))
+    results.append(bench_function("calculate_shanten", lambda c: calculate_shanten(c), thirteen, repeat))
+    results.append(bench_function("smart_discard", lambda c: smart_discard(list(c[0])), all_hands, max(1, repeat // 10)))
+    results.append(bench_function("Player.hand_tiles", lambda p: p.hand_tiles(), players, repeat))
+
+    clear_caches()
+    start = time.perf_counter()
+    winners = []
+    for seed in range(games):
+        winner = Game(human_players=[], seed=seed).play_bot_game()
+        winners.append(winner.id if winner else None)
+    seconds = time.perf_counter() - start
+    results.append({
+        "name": "full_bot_game",
+        "ns_per_op": seconds * 1e9 / games,
+        "games_per_sec": games / seconds,
+        "caches": cache_stats(),
+        "ops": games,
+        "digest": hashlib.sha1(repr(winners).encode()).hexdigest()[:12],
+    })
+    return results
+
+def print_results(results):
+    print(f"{'benchmark':<28}{'ns/op':>14}{'peak B/op':>12}  digest")
+    for result in results:
+        peak = result.get("peak_bytes_per_op", "")
+        print(f"{result['name']:<28}{result['ns_per_op']:>14.0f}{peak:>12}  {result['digest']}")
+        if "games_per_sec" in result:
+            print(f"{'':<28}{result['games_per_sec']:>14.2f} games/sec")
+        for name, stats in result.get("caches", {}).items():
+            print(f"{'':<28}{name} cache hit rate {stats['hit_rate']:.1%} ({stats['size']} entries)")
+
+def compare(results, baseline, tolerance):
+    # Returns the list of regressions against the baseline (slower than tolerance, or different results)
+    previous = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        if old["digest"] != result["digest"]:
+            regressions.append(f"{result['name']}: results changed ({old['digest']} -> {result['digest']})")
+        ratio = result["ns_per_op"] / old["ns_per_op"]
+        if ratio > 1 + tolerance:
+            regressions.append(f"{result['name']}: {ratio:.2f}x slower ({old['ns_per_op']:.0f} -> {result['ns_per_op']:.0f} ns/op)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Mahjong rules, bots and engine")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the corpus per benchmark")
+    parser.add_argument("--games", type=int, default=20, help="Full bot games for the end-to-end benchmark")
+    parser.add_argument("--save", help="Write results to this baseline file")
+    parser.add_argument("--compare", help="Compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat, args.games)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
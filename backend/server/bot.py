@@ -4,34 +4,302 @@ bot.py:
 Handles bot logic (e.g. discarding)
 """
 
-from collections import Counter
-
-def smart_discard(hand):
-    # Counts occurrences of each tile
-    tile_counts = Counter(hand)
-    keep_tiles = set() # Tiles with potential will be kept here
-
-    # Keep pairs and above (for Pong / Gang)
-    for tile, count in tile_counts.items():
-        if count >= 2:
-            keep_tiles.add(tile)
-
-    # Check for potential sequences (for Chi)
-    for tile in hand:
-        if len(tile) == 2 and tile[1] in ['B', 'C', 'D']:
-            try:
-                num = int(tile[0])
+import logging
+import os
+import random
+import time
+
+from cache import HandCache, cached_by_hand
+from metrics import BOT_LATENCY, timed
+from rules import calculate_shanten, resolve_chi, resolve_pong
+from tiles import NUM_TILE_TYPES, hand_from_tiles, is_bonus, is_suited, tile_name
+
+logger = logging.getLogger(__name__)
+
+DISCARD_CACHE = HandCache("discard")
+
+def useful_tiles(hand):
+    # Tiles that could possibly improve the hand: copies of held tiles and suited tiles within 2
+    useful = set()
+    for tile in range(NUM_TILE_TYPES):
+        if hand[tile]:
+            useful.add(tile)
+            if is_suited(tile):
+                rank = tile % 9
                 for i in [-2, -1, 1, 2]:
-                    j = f"{num+i}{tile[1]}"
-                    if j in hand:
-                        keep_tiles.add(tile)
-            except ValueError:
-                continue
-
-    # Discard tiles not added to keep_tiles
-    for tile in list(hand):
-        if tile not in keep_tiles:
-            print(f"Bot discarding tile: {tile}")
+                    if 0 <= rank + i <= 8:
+                        useful.add(tile + i)
+    return useful
+
+def count_ukeire(hand, shanten=None):
+    # Number of tile draws (counting remaining copies) that lower the hand's shanten
+    if shanten is None:
+        shanten = calculate_shanten(hand)
+
+    ukeire = 0
+    for tile in useful_tiles(hand):
+        remaining = 4 - hand[tile]
+        if remaining:
+            hand[tile] += 1
+            if calculate_shanten(hand) < shanten:
+                ukeire += remaining
+            hand[tile] -= 1
+    return ukeire
+
+@cached_by_hand(DISCARD_CACHE)
+def efficient_discard(hand):
+    # Discard the tile that leaves the lowest shanten, breaking ties by the most ukeire.
+    # Honors are tried first so that equally good hands give up the least flexible tile
+    best_tile = None
+    best_key = None
+
+    for tile in reversed(range(NUM_TILE_TYPES)):
+        if not hand[tile]:
+            continue
+
+        hand[tile] -= 1
+        shanten = calculate_shanten(hand)
+        if best_key is None or shanten <= best_key[0]:
+            key = (shanten, -count_ukeire(hand, shanten))
+            if best_key is None or key < best_key:
+                best_tile, best_key = tile, key
+        hand[tile] += 1
+
+    return best_tile
+
+# Defence (see danger.py)
+DANGER_TOLERANCE = 0.35 # Danger an efficient discard may carry before the bot looks for a safer one
+DANGER_MARGIN = 0.1 # How much safer a replacement has to be
+FOLD_SHANTEN = 3 # From this far from ready, the bot gives up a tile of progress for a safer discard
+
+@timed(BOT_LATENCY, "discard")
+def smart_discard(hand, danger=None, seat=None):
+    # Most efficient discard (see efficient_discard). With the game's DangerModel and the bot's
+    # seat (0-based), a discard that risks dealing in is swapped for a safer one where that costs
+    # no progress, or one tile of progress when the hand is far from ready anyway
+    tile = efficient_discard(hand)
+    if danger is not None and tile is not None:
+        tile = safer_discard(hand, tile, danger, seat)
+    if tile is not None:
+        logger.debug("Bot discarding tile: %s", tile_name(tile))
+    return tile
+
+def safer_discard(hand, tile, danger, seat):
+    risk = danger.danger(tile, seat, hand)
+    if risk <= DANGER_TOLERANCE:
+        return tile
+
+    hand[tile] -= 1
+    allowed = calculate_shanten(hand)
+    hand[tile] += 1
+    if allowed >= FOLD_SHANTEN:
+        allowed += 1
+
+    best_tile, best_risk = tile, risk - DANGER_MARGIN
+    for other in range(NUM_TILE_TYPES):
+        if not hand[other] or other == tile:
+            continue
+        other_risk = danger.danger(other, seat, hand)
+        if other_risk < best_risk:
+            hand[other] -= 1
+            if calculate_shanten(hand) <= allowed:
+                best_tile, best_risk = other, other_risk
+            hand[other] += 1
+    return best_tile
+
+def ranked_discards(hand):
+    # Every distinct discard, best first by the same (shanten, -ukeire, honors first) order as smart_discard
+    keys = []
+    for tile in reversed(range(NUM_TILE_TYPES)):
+        if hand[tile]:
+            hand[tile] -= 1
+            shanten = calculate_shanten(hand)
+            keys.append((shanten, -count_ukeire(hand, shanten), len(keys), tile))
+            hand[tile] += 1
+    keys.sort()
+    return [key[-1] for key in keys]
+
+# Monte Carlo lookahead
+# A stronger bot tier. Each candidate discard (or claim) is scored by playing the table forward from
+# determinised copies of it: the tiles this bot cannot see are reshuffled between the other hands
+# and the wall. Every candidate is played out on the same samples, rollouts use quick shanten-only
+# discards for ROLLOUT_HORIZON draws, and the search stops at a hard per-move time budget
+
+LOOKAHEAD_BUDGET = float(os.getenv("BOT_LOOKAHEAD_BUDGET", "0.2")) # Seconds per decision
+LOOKAHEAD_CANDIDATES = 4 # Best one-ply discards that get rollouts
+ROLLOUT_HORIZON = 16 # Draws per rollout
+
+WIN_SCORE = 1.0
+DEAL_IN_SCORE = -1.0 # This bot's discard wins someone else the hand
+OTHER_WIN_SCORE = -0.25
+SHANTEN_WEIGHT = 0.05 # Per tile still needed when the rollout stops
+
+# Few rollouts are mostly noise, so the search only overrides the basic bot (best one-ply discard,
+# always claim) once it has enough of them, and declines a claim only when passing is clearly better
+LOOKAHEAD_MIN_ROUNDS = 8
+CLAIM_MARGIN = 0.2
+
+def quick_discard(hand):
+    # Rollout policy: lowest shanten, without the ukeire tiebreak
+    best_tile = None
+    best_shanten = None
+    for tile in reversed(range(NUM_TILE_TYPES)):
+        if hand[tile]:
+            hand[tile] -= 1
+            shanten = calculate_shanten(hand)
+            hand[tile] += 1
+            if best_shanten is None or shanten < best_shanten:
+                best_tile, best_shanten = tile, shanten
+    return best_tile
+
+def determinise(players, wall, me_idx, rng):
+    # Copy of the table where the other concealed hands and the live wall are redealt at random.
+    # Bonus tiles stay where they are in the wall, since they never go into a hand
+    players = [player.clone() for player in players]
+    wall = wall.clone()
+    positions = [i for i in range(wall.front, wall.back) if not is_bonus(wall.tiles[i])]
+    pool = [wall.tiles[i] for i in positions]
+    for idx, player in enumerate(players):
+        if idx != me_idx:
+            pool.extend(player.hand_tiles())
+    rng.shuffle(pool)
+
+    start = 0
+    for idx, player in enumerate(players):
+        if idx != me_idx:
+            size = player.hand_size()
+            player.hand = hand_from_tiles(pool[start:start + size])
+            player.refresh_waits()
+            start += size
+    for i, tile in zip(positions, pool[start:]):
+        wall.tiles[i] = tile
+    return players, wall
+
+def draw_from(wall, replacement=False):
+    # Next non-bonus tile (bonus tiles are skipped in rollouts), or None once the wall is empty
+    while wall:
+        tile = wall.draw_replacement() if replacement else wall.draw()
+        if not is_bonus(tile):
             return tile
-        
-    return hand.pop() # If all tiles are in keep_tiles, discard the last tile
\ No newline at end of file
+    return None
+
+def play_out(players, wall, me_idx, discarder, tile):
+    # Plays on from a discard and scores the result for players[me_idx]
+    turn = discarder
+    for step in range(ROLLOUT_HORIZON):
+        for offset in range(1, len(players)):
+            idx = (turn + offset) % len(players)
+            if tile in players[idx].waits:
+                if idx == me_idx:
+                    return WIN_SCORE
+                return DEAL_IN_SCORE if turn == me_idx else OTHER_WIN_SCORE
+
+        turn = (turn + 1) % len(players)
+        player = players[turn]
+        drawn = draw_from(wall)
+        if drawn is None:
+            return 0.0
+        won = drawn in player.waits
+        player.draw_tile(drawn)
+        if won:
+            return WIN_SCORE if turn == me_idx else OTHER_WIN_SCORE
+        tile = quick_discard(player.hand)
+        player.remove_tile(tile)
+    return -SHANTEN_WEIGHT * calculate_shanten(players[me_idx].hand)
+
+def apply_option(players, wall, me_idx, option):
+    # Applies a candidate to a determinised table. Returns (discarder, tile) to play on from, or a
+    # final score if the option ends the hand straight away
+    kind, discarder, tile = option
+    me = players[me_idx]
+    if kind == "discard":
+        me.remove_tile(tile)
+        return me_idx, tile
+    if kind == "pass":
+        return discarder, tile
+
+    if kind == "pong":
+        resolve_pong(me, tile)
+    elif kind == "chi":
+        resolve_chi(me, tile)
+    elif kind == "gang":
+        me.remove_tile(tile, 3)
+        me.exposed_hand.append([tile] * 4)
+        drawn = draw_from(wall, replacement=True)
+        if drawn is None:
+            return 0.0
+        won = drawn in me.waits
+        me.draw_tile(drawn)
+        if won:
+            return WIN_SCORE
+    discard = quick_discard(me.hand)
+    me.remove_tile(discard)
+    return me_idx, discard
+
+def run_rollouts(task):
+    # Rolls out every option on shared samples until the budget or rollout cap runs out.
+    # Returns (total score, rollouts) per option. Runs as-is in pool workers
+    players, wall, me_idx, options, seed, budget, max_rounds = task
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + budget
+    totals = [0.0] * len(options)
+    rounds = 0
+    while max_rounds is None or rounds < max_rounds:
+        sample_players, sample_wall = determinise(players, wall, me_idx, rng)
+        scores = []
+        for option in options:
+            if time.perf_counter() >= deadline:
+                return totals, rounds # A round cut short is dropped, so every option keeps the same samples
+            sim_players = [player.clone() for player in sample_players]
+            sim_wall = sample_wall.clone()
+            start = apply_option(sim_players, sim_wall, me_idx, option)
+            if isinstance(start, float):
+                scores.append(start)
+            else:
+                scores.append(play_out(sim_players, sim_wall, me_idx, *start))
+        for i, score in enumerate(scores):
+            totals[i] += score
+        rounds += 1
+    return totals, rounds
+
+def evaluate_options(game, player, options, budget=None, max_rounds=None, pool=None, processes=1):
+    # Mean rollout score of each option. With a pool, each of `processes` workers runs its own
+    # samples under the same budget and the results are merged
+    budget = LOOKAHEAD_BUDGET if budget is None else budget
+    seed = game.seed * 1000003 + len(game.actions) # Same decision, same samples
+    base = (game.players, game.wall, player.id - 1, options)
+    if pool is not None and processes > 1:
+        results = pool.map(run_rollouts, [base + (seed + i, budget, max_rounds) for i in range(processes)])
+    else:
+        results = [run_rollouts(base + (seed, budget, max_rounds))]
+
+    totals = [0.0] * len(options)
+    rounds = 0
+    for option_totals, option_rounds in results:
+        rounds += option_rounds
+        for i, total in enumerate(option_totals):
+            totals[i] += total
+    logger.debug("Lookahead ran %s rollouts per option", rounds)
+    return [total / rounds if rounds else 0.0 for total in totals], rounds
+
+@timed(BOT_LATENCY, "lookahead_discard")
+def lookahead_discard(game, player, **search):
+    candidates = ranked_discards(player.hand)[:LOOKAHEAD_CANDIDATES]
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+
+    options = [("discard", player.id - 1, tile) for tile in candidates]
+    scores, rounds = evaluate_options(game, player, options, **search)
+    if rounds < LOOKAHEAD_MIN_ROUNDS:
+        return candidates[0]
+    best = max(range(len(candidates)), key=lambda i: (scores[i], -i)) # Ties keep the one-ply order
+    logger.debug("Bot lookahead discarding tile: %s", tile_name(candidates[best]))
+    return candidates[best]
+
+@timed(BOT_LATENCY, "lookahead_claim")
+def lookahead_claim(game, player, kind, tile, discarder_idx, **search):
+    # Whether claiming the discard ("pong", "chi" or "gang") scores better than letting it go
+    options = [("pass", discarder_idx, tile), (kind, discarder_idx, tile)]
+    (pass_score, claim_score), rounds = evaluate_options(game, player, options, **search)
+    return rounds < LOOKAHEAD_MIN_ROUNDS or claim_score >= pass_score - CLAIM_MARGIN
+
@@ -0,0 +1,103 @@
+"""
+cache.py:
+
+Handles process-wide memoisation of rule and bot results. Entries are keyed by the hand signature
+(the count vector packed into bytes), kept in bounded LRU caches, and report hits and misses to
+/metrics.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from metrics import REGISTRY
+
+HAND_CACHE_SIZE = int(os.environ.get("HAND_CACHE_SIZE", 65536)) # Entries per cache
+
+CACHES = []
+MISSING = object()
+
+def hand_signature(hand):
+    # Canonical, hashable form of a count vector
+    return bytes(hand)
+
+class HandCache:
+    def __init__(self, name, maxsize=HAND_CACHE_SIZE):
+        self.name = name
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        CACHES.append(self)
+
+    def get(self, key, default=MISSING):
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False) # Evict the least recently used
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        hits, misses = self.hits, self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+def cached_by_hand(cache):
+    # Decorator for functions of a single count vector whose result only depends on its contents
+    def decorator(func):
+        @wraps(func)
+        def wrapper(hand):
+            key = hand_signature(hand)
+            value = cache.get(key)
+            if value is MISSING:
+                value = func(hand)
+                cache.put(key, value)
+            return value
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+class CacheMetrics:
+    # Renders every cache's lookups as one labelled counter on /metrics
+    kind = "counter"
+    name = "mahjong_hand_cache_lookups_total"
+    help_text = "Hand cache lookups by cache and result"
+
+    def render(self):
+        lines = []
+        for cache in CACHES:
+            lines.append(f'{self.name}{{cache="{cache.name}",result="hit"}} {cache.hits}')
+            lines.append(f'{self.name}{{cache="{cache.name}",result="miss"}} {cache.misses}')
+        return lines
+
+REGISTRY.append(CacheMetrics())
+
+def cache_stats():
+    return {cache.name: cache.stats() for cache in CACHES}
+
+def clear_caches():
+    for cache in CACHES:
+        cache.clear()
@@ -0,0 +1,107 @@
+"""
+claims.py:
+
+Handles claims on a discard. A ClaimWindow holds every seat's legal claims on one discard
+(win > gang > pong > chi, only the next seat may Chi), worked out in one pass from the count-vector
+hands and wait sets. It collects one response per seat: bots answer as soon as the window opens,
+and humans answer through the API or pass when the window times out. The highest priority claim
+wins, and ties go to the seat closest to the discarder in turn order. The window resolves as soon
+as no outstanding response could beat the best one so far, rather than always waiting for every seat.
+"""
+
+import time
+
+from actions import PASS_CHI, PASS_PONG
+from rules import can_chi, can_gang, can_pong, can_win
+from tiles import tile_name
+
+CLAIM_KINDS = ("win", "gang", "pong", "chi") # Highest priority first
+PRIORITY = {kind: len(CLAIM_KINDS) - i for i, kind in enumerate(CLAIM_KINDS)}
+
+class ClaimError(ValueError):
+    pass
+
+def pass_code(kinds):
+    # Action logged when a seat passes on these claims
+    return PASS_CHI if kinds == ["chi"] else PASS_PONG
+
+def legal_claims(players, discarder_idx, tile):
+    # {player id: claim kinds, best first} for every seat that can claim the discard
+    options = {}
+    for offset in range(1, len(players)):
+        player = players[(discarder_idx + offset) % len(players)]
+        kinds = []
+        if tile in player.waits and can_win(player, tile): # Waits only check the shape, not the Tai
+            kinds.append("win")
+        if can_gang(player.hand, tile):
+            kinds.append("gang")
+        if can_pong(player.hand, tile):
+            kinds.append("pong")
+        if offset == 1 and can_chi(player.hand, tile):
+            kinds.append("chi")
+        if kinds:
+            options[player.id] = kinds
+    return options
+
+class ClaimWindow:
+    __slots__ = ("tile", "discarder_idx", "options", "responses", "deadline")
+
+    def __init__(self, tile, discarder_idx, options):
+        self.tile = tile
+        self.discarder_idx = discarder_idx
+        self.options = options # Player id -> legal claim kinds
+        self.responses = {} # Player id -> claim kind, or None for a pass
+        self.deadline = None # time.monotonic() after which unanswered seats pass
+
+    def start_timer(self, timeout):
+        self.deadline = time.monotonic() + timeout
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def waiting(self):
+        return [player_id for player_id in self.options if player_id not in self.responses]
+
+    def can_claim(self, player_id, kind):
+        # Whether the seat may still answer with this claim
+        return player_id not in self.responses and kind in self.options.get(player_id, ())
+
+    def respond(self, player_id, kind):
+        if player_id not in self.options or player_id in self.responses:
+            raise ClaimError(f"Player {player_id} has no claim to make on {tile_name(self.tile)}")
+        if kind is not None and kind not in self.options[player_id]:
+            raise ClaimError(f"Player {player_id} can't {kind} {tile_name(self.tile)}")
+        self.responses[player_id] = kind
+
+    def rank(self, player_id, kind):
+        # Priority of the claim, then the seat nearest the discarder
+        return PRIORITY[kind], -((player_id - 1 - self.discarder_idx) % 4)
+
+    def best(self):
+        # (player id, kind) of the winning claim among the responses so far, or None
+        claims = [(player_id, kind) for player_id, kind in self.responses.items() if kind is not None]
+        return max(claims, key=lambda claim: self.rank(*claim), default=None)
+
+    def decided(self):
+        # True once no seat still to answer could beat the best claim so far
+        best = self.best()
+        best_rank = self.rank(*best) if best else (0, 0)
+        return all(self.rank(player_id, self.options[player_id][0]) < best_rank for player_id in self.waiting())
+
+    def clone(self):
+        other = ClaimWindow(self.tile, self.discarder_idx, self.options)
+        other.responses = self.responses.copy()
+        other.deadline = self.deadline
+        return other
+
+    def snapshot(self):
+        # The deadline is left out: a restored window gets a fresh timer when the table resumes
+        return (self.tile, self.discarder_idx, tuple((player_id, tuple(kinds)) for player_id, kinds in self.options.items()),
+                tuple(self.responses.items()))
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        tile, discarder_idx, options, responses = snapshot
+        window = cls(tile, discarder_idx, {player_id: list(kinds) for player_id, kinds in options})
+        window.responses = dict(responses)
+        return window
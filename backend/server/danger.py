@@ -0,0 +1,137 @@
+"""
+danger.py:
+
+Handles the deal-in risk of discards. Every game keeps one DangerModel, updated as tiles are
+discarded and melds exposed, so a bot can ask how dangerous a tile is against the other players
+without going back over the discard pile. It tracks:
+    - each player's own discards (genbutsu: they gave the tile up, so it is unlikely to be their wait)
+    - suji: tiles three apart in the same suit from a player's discards
+    - how many copies of each tile are visible in discards and exposed melds
+    - flush suspicion, when a player's exposed melds all share one suit
+
+This ruleset has no furiten, so genbutsu and suji make a tile safer rather than safe.
+"""
+
+from actions import CHI, DISCARD, GANG, PONG, iter_actions
+from rules import tile_group
+from tiles import NUM_TILE_TYPES, is_suited
+
+# Risk against a player who is ready, before any read of their discards
+HONOR_RISK = 0.6 # Honors only complete pairs and pongs
+RANK_RISK = (0.6, 0.8, 1.0, 1.0, 1.0, 1.0, 1.0, 0.8, 0.6) # Terminals complete fewer sequences
+
+GENBUTSU_FACTOR = 0.25
+SUJI_FACTOR = 0.6 # Every suji partner discarded
+HALF_SUJI_FACTOR = 0.8 # One of two suji partners discarded
+HONOR_REMAINING_FACTORS = (0.0, 0.3, 0.7, 1.0, 1.0) # By unseen copies: no copies left means no pair or pong
+SUITED_REMAINING_FACTORS = (0.6, 0.8, 1.0, 1.0, 1.0)
+FLUSH_SUIT_FACTOR = 2.0
+FLUSH_HONOR_FACTOR = 1.2
+FLUSH_OFF_SUIT_FACTOR = 0.3
+
+THREAT_MELD_WEIGHT = 4 # An exposed meld counts as much as this many discards towards being ready
+THREAT_FULL = 20 # Discards (plus weighted melds) after which a player is treated as ready
+
+def suji_partners(tile):
+    rank = tile % 9
+    return [tile + step for step in (-3, 3) if 0 <= rank + step <= 8]
+
+class DangerModel:
+    __slots__ = ("discarded", "discard_counts", "visible", "melds", "group_melds")
+
+    def __init__(self, num_players=4):
+        self.discarded = [bytearray(NUM_TILE_TYPES) for i in range(num_players)] # Per seat: copies of each tile it discarded
+        self.discard_counts = [0] * num_players
+        self.visible = bytearray(NUM_TILE_TYPES) # Copies of each tile in discards or exposed melds
+        self.melds = [0] * num_players
+        self.group_melds = [[0] * 4 for i in range(num_players)] # Per seat: exposed melds per suit (and honors)
+
+    def add_discard(self, seat, tile):
+        self.discarded[seat][tile] += 1
+        self.discard_counts[seat] += 1
+        self.visible[tile] += 1
+
+    def add_meld(self, seat, meld, claimed=None):
+        # A newly exposed meld; the claimed discard was already counted as visible
+        for tile in meld:
+            self.visible[tile] += 1
+        if claimed is not None:
+            self.visible[claimed] -= 1
+        self.melds[seat] += 1
+        self.group_melds[seat][tile_group(meld[0])] += 1
+
+    def add_tile(self, tile):
+        # A tile added to an existing meld (add-on Gang)
+        self.visible[tile] += 1
+
+    def clone(self):
+        other = DangerModel.__new__(DangerModel)
+        other.discarded = [bytearray(discarded) for discarded in self.discarded]
+        other.discard_counts = self.discard_counts.copy()
+        other.visible = bytearray(self.visible)
+        other.melds = self.melds.copy()
+        other.group_melds = [groups.copy() for groups in self.group_melds]
+        return other
+
+    @classmethod
+    def from_game(cls, players, actions):
+        # Rebuilds the model from a game's action log and exposed melds (e.g. after a restore)
+        model = cls(len(players))
+        for code, player_id, tile in iter_actions(actions):
+            if code == DISCARD:
+                model.add_discard(player_id - 1, tile)
+            elif code in (PONG, CHI, GANG):
+                model.visible[tile] -= 1 # Counted again with the meld below
+        for seat, player in enumerate(players):
+            for meld in player.exposed_hand:
+                model.add_meld(seat, meld)
+        return model
+
+    def threat(self, seat):
+        # Rough chance (0-1) that the player is ready, from how far the game and their melds have got
+        return min(1.0, (self.discard_counts[seat] + THREAT_MELD_WEIGHT * self.melds[seat]) / THREAT_FULL)
+
+    def flush_suit(self, seat):
+        # The suit a player is suspected of collecting a flush in, or None
+        groups = self.group_melds[seat]
+        suits = [group for group in range(3) if groups[group]]
+        if len(suits) == 1 and self.melds[seat] >= 2:
+            return suits[0]
+        return None
+
+    def risk(self, tile, seat, held=0):
+        # Danger of discarding the tile into one player, scaled as if they were ready.
+        # held is how many copies the asking player has in hand, which are not visible to anyone else
+        unseen = max(0, 4 - self.visible[tile] - held)
+        if is_suited(tile):
+            risk = RANK_RISK[tile % 9] * SUITED_REMAINING_FACTORS[unseen]
+        else:
+            risk = HONOR_RISK * HONOR_REMAINING_FACTORS[unseen]
+
+        discarded = self.discarded[seat]
+        if discarded[tile]:
+            risk *= GENBUTSU_FACTOR
+        elif is_suited(tile):
+            partners = suji_partners(tile)
+            safe = sum(1 for partner in partners if discarded[partner])
+            if safe == len(partners):
+                risk *= SUJI_FACTOR
+            elif safe:
+                risk *= HALF_SUJI_FACTOR
+
+        flush = self.flush_suit(seat)
+        if flush is not None:
+            group = tile_group(tile)
+            if group == flush:
+                risk *= FLUSH_SUIT_FACTOR
+            elif group == 3:
+                risk *= FLUSH_HONOR_FACTOR
+            else:
+                risk *= FLUSH_OFF_SUIT_FACTOR
+        return risk
+
+    def danger(self, tile, seat, hand=None):
+        # Expected risk of the given seat discarding the tile, summed over the other players
+        held = hand[tile] if hand is not None else 0
+        return sum(self.threat(other) * self.risk(tile, other, held)
+                   for other in range(len(self.melds)) if other != seat)
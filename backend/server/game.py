@@ -4,225 +4,428 @@ Game Class:
 Simulates actual turn-based game, with dealing and player interaction (Chi, Gang, Pong) etc.
 """
 
+import logging
 import random
+import uuid
+from array import array
+from actions import (
+    DEAL, DRAW, DISCARD, PONG, CHI, GANG, CONCEALED_GANG, ADDON_GANG, PASS_PONG, PASS_CHI, WIN, DRAW_GAME,
+    CLAIM, ACTION_NAMES, NO_TILE, pack_log
+)
+from claims import CLAIM_KINDS, ClaimError, ClaimWindow, legal_claims, pass_code
+from danger import DangerModel
+from logs import log_game_event
+from metrics import DISCARDS
 from player import Player
-from tiles import generate_full_wall
+from wall import Wall
+from tiles import is_bonus, tile_name, tile_names
 from rules import (
-    handle_bonus_tile, calculate_tai, check_win,
-    can_chi, can_pong, can_gang, can_concealed_gang, can_addon_gang, find_valid_chis,
+    handle_bonus_tile, calculate_tai, can_win,
+    can_concealed_gang, can_addon_gang, find_valid_chis,
     resolve_chi, resolve_pong, resolve_gang, resolve_concealed_gang, resolve_addon_gang
 )
-from bot import smart_discard
+from policies import DEFAULT_POLICY, get_policy, resolve_policy
+
+logger = logging.getLogger(__name__)
 
 class Game:
-    def __init__(self, human_players=None):
+    __slots__ = (
+        "players", "human_players", "id", "seed", "rng", "wall", "turn", "winner", "has_drawn", "is_draw",
+        "last_discard", "last_discarder", "discard_pile", "last_drawn", "last_discarded", "just_ponged_chi",
+        "drew_tile", "version", "actions", "policies", "bots", "danger", "claims"
+    )
+
+    def __init__(self, human_players=None, seed=None, policies=None):
         self.players = [Player(i) for i in range(1, 5)]
-        self.human_players = human_players or [1]  
-        self.wall = generate_full_wall()
-        random.shuffle(self.wall)
+        self.human_players = [1] if human_players is None else human_players
+        self.id = uuid.uuid4().hex[:12]
+        self.seed = random.randrange(2 ** 63) if seed is None else seed # Always known, so any game can be replayed
+        self.rng = random.Random(self.seed) # Per-game RNG so seeded games replay exactly
+        self.wall = Wall(self.rng)
         self.turn = 0
         self.winner = None
         self.has_drawn = False
         self.is_draw = False
-        self.last_discard = None
+        self.last_discard = None # Discard with a claim window open
         self.last_discarder = -1  
         self.discard_pile = []  
+        self.last_drawn = None
+        self.last_discarded = None
+        self.just_ponged_chi = False
+        self.drew_tile = False # The current player's newest tile came from the wall or a Gang replacement
+        self.version = 0 # Sequence number of the last state published to clients
+        self.actions = array("B") # Action log, see actions.py
+        # Bot policy for each seat (see policies.py). policies maps player ids to registered names or
+        # to BotPolicy objects; unknown names fail here rather than on the bot's first turn
+        self.bots = tuple(resolve_policy((policies or {}).get(player.id, DEFAULT_POLICY)) for player in self.players)
+        self.policies = tuple(bot.name for bot in self.bots) # Names, as kept in snapshots
+        self.danger = DangerModel(len(self.players)) # Deal-in risk of each tile, kept up to date for the bots
+        self.claims = None # ClaimWindow on the last discard while it waits for human answers
+
+    def clone(self):
+        # Independent copy (players, wall and RNG included) for lookahead and simulation
+        other = Game.__new__(Game)
+        other.players = [player.clone() for player in self.players]
+        other.human_players = list(self.human_players)
+        other.id = self.id
+        other.seed = self.seed
+        other.rng = random.Random()
+        other.rng.setstate(self.rng.getstate())
+        other.wall = self.wall.clone()
+        other.turn = self.turn
+        other.winner = other.players[self.winner.id - 1] if self.winner else None
+        other.has_drawn = self.has_drawn
+        other.is_draw = self.is_draw
+        other.last_discard = self.last_discard
+        other.last_discarder = self.last_discarder
+        other.discard_pile = self.discard_pile.copy()
+        other.last_drawn = self.last_drawn
+        other.last_discarded = self.last_discarded
+        other.just_ponged_chi = self.just_ponged_chi
+        other.drew_tile = self.drew_tile
+        other.version = self.version
+        other.actions = array("B", self.actions)
+        other.policies = self.policies
+        other.bots = self.bots
+        other.danger = self.danger.clone()
+        other.claims = self.claims.clone() if self.claims else None
+        return other
+
+    def snapshot(self):
+        # Immutable copy of the whole game state (tuples, bytes and the RNG state)
+        return (
+            self.id, self.seed, tuple(self.human_players), self.rng.getstate(), self.wall.snapshot(),
+            tuple(player.snapshot() for player in self.players), self.turn,
+            self.winner.id if self.winner else None, self.has_drawn, self.is_draw, self.last_discard,
+            self.last_discarder, tuple(self.discard_pile), self.last_drawn, self.last_discarded,
+            self.just_ponged_chi, self.drew_tile, self.version, bytes(self.actions), self.policies,
+            self.claims.snapshot() if self.claims else None
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        (game_id, seed, human_players, rng_state, wall, players, turn, winner_id, has_drawn, is_draw,
+         last_discard, last_discarder, discard_pile, last_drawn, last_discarded, just_ponged_chi, drew_tile, version,
+         actions, policies, claims) = snapshot
+        game = cls.__new__(cls)
+        game.id = game_id
+        game.seed = seed
+        game.human_players = list(human_players)
+        game.rng = random.Random()
+        game.rng.setstate(rng_state)
+        game.wall = Wall.from_snapshot(wall)
+        game.players = [Player.from_snapshot(player) for player in players]
+        game.turn = turn
+        game.winner = game.players[winner_id - 1] if winner_id else None
+        game.has_drawn = has_drawn
+        game.is_draw = is_draw
+        game.last_discard = last_discard
+        game.last_discarder = last_discarder
+        game.discard_pile = list(discard_pile)
+        game.last_drawn = last_drawn
+        game.last_discarded = last_discarded
+        game.just_ponged_chi = just_ponged_chi
+        game.drew_tile = drew_tile
+        game.version = version
+        game.actions = array("B", actions)
+        game.policies = tuple(policies)
+        game.bots = tuple(get_policy(name) for name in game.policies)
+        game.danger = DangerModel.from_game(game.players, game.actions)
+        game.claims = ClaimWindow.from_snapshot(claims) if claims else None
+        return game
+
+    def log_event(self, event, **fields):
+        # Structured per-game event (only written when GAME_EVENT_LOG is set)
+        log_game_event(self.id, event, **fields)
+
+    def record(self, code, player_id=0, tile=None):
+        self.actions.extend((code, player_id, NO_TILE if tile is None else tile))
+
+    def action_log(self):
+        # Seed, human seats and actions packed together (see actions.unpack_log and replay.py)
+        return pack_log(self.seed, self.human_players, self.actions)
 
     def deal_tiles(self):
+        # Hands are count vectors, so they stay sorted without any re-sorting. Waits are worked out
+        # once per player after the deal rather than on every tile
+        dealt = [[] for player in self.players]
         for i in range(13):
-            for player in self.players:
-                drawn_tile = self.wall.pop()
+            for player, tiles in zip(self.players, dealt):
+                drawn_tile = self.wall.draw()
 
-                while drawn_tile.startswith("Flower") or drawn_tile.startswith("Season") or drawn_tile in ['Cat', 'Mouse', 'Chicken', 'Centipede']:
+                while is_bonus(drawn_tile):
                     handle_bonus_tile(player, drawn_tile)
-                    drawn_tile = self.wall.pop()
+                    drawn_tile = self.wall.draw_replacement()
 
-                player.draw_tile(drawn_tile)
-                player.hand = self.sort_tiles(player.hand)
+                tiles.append(drawn_tile)
+        for player, tiles in zip(self.players, dealt):
+            player.draw_tiles(tiles)
+        self.record(DEAL)
+        self.log_event("deal", seed=self.seed, human_players=self.human_players)
 
     def get_player_info(self, player_num):
         player_affected = self.players[player_num - 1]
         bonus_tiles = player_affected.bonus_tiles
         exposed_hand = player_affected.exposed_hand
-        hand = player_affected.hand
+        hand = player_affected.hand_tiles()
         return {"bonus_tiles": bonus_tiles, "exposed_hand": exposed_hand, "hand": hand}
     
     def discard_tile(self, player_id, discarded_tile):
         player = self.players[player_id - 1]
-        if discarded_tile in player.hand:
-            player.hand.remove(discarded_tile) 
-            print(f"Discarded tile {discarded_tile} from Player {player_id}")
-            player.hand = self.sort_tiles(player.hand)
+        if player.hand[discarded_tile]:
+            player.remove_tile(discarded_tile)
+            logger.debug("Discarded tile %s from Player %s", tile_name(discarded_tile), player_id)
+            self.log_event("discard", player=player_id, tile=tile_name(discarded_tile))
             self.last_discard = discarded_tile
+            self.last_discarded = discarded_tile
+            self.just_ponged_chi = False
+            self.has_drawn = False
+            self.drew_tile = False
             self.discard_pile.append(discarded_tile)
+            self.danger.add_discard(player_id - 1, discarded_tile)
+            self.record(DISCARD, player_id, discarded_tile)
+            DISCARDS.inc()
         else:
-            print(f"Error: Tile {discarded_tile} not found in Player {player_id}'s hand!")
+            logger.warning("Tile %s not found in Player %s's hand!", tile_name(discarded_tile), player_id)
+
+    def policy(self, player):
+        return self.bots[player.id - 1]
 
-    def bot_discard(self):
+    def bot_discard(self, discarded_tile=None):
+        # Discards for the current bot: the given tile (e.g. from a batched policy), else the seat's policy's choice
         current_player = self.players[self.turn]
         if current_player.id not in self.human_players:
-            discarded_tile = smart_discard(current_player.hand)
-            if not discarded_tile or discarded_tile not in current_player.hand:
-                if current_player.hand:
-                    discarded_tile = random.choice(current_player.hand)
+            if discarded_tile is None:
+                discarded_tile = self.policy(current_player).discard(self, current_player)
+            if discarded_tile is None or not current_player.hand[discarded_tile]:
+                hand_tiles = current_player.hand_tiles()
+                if hand_tiles:
+                    discarded_tile = self.rng.choice(hand_tiles)
                 else:
                     return None
             self.discard_tile(current_player.id, discarded_tile)
-            current_player.hand = self.sort_tiles(current_player.hand)
             return discarded_tile
         return None
     
     def draw_tile(self):
         current_player = self.players[self.turn]
-        drawn_tile = self.wall.pop()
+        drawn_tile = self.wall.draw()
 
-        while drawn_tile.startswith("Flower") or drawn_tile.startswith("Season") or drawn_tile in ['Cat', 'Mouse', 'Chicken', 'Centipede']:
+        while is_bonus(drawn_tile):
             handle_bonus_tile(current_player, drawn_tile)
-            print(f"Player {current_player.id} draws bonus tile {drawn_tile}, replacing...")
+            logger.debug("Player %s draws bonus tile %s, replacing...", current_player.id, tile_name(drawn_tile))
+            self.log_event("bonus", player=current_player.id, tile=tile_name(drawn_tile))
             if self.wall:
-                drawn_tile = self.wall.pop()
+                drawn_tile = self.wall.draw_replacement()
             else: 
-                break
+                self.record(DRAW, current_player.id)
+                return None
             
-        current_player.hand.append(drawn_tile)
+        current_player.draw_tile(drawn_tile)
+        self.last_drawn = drawn_tile
+        self.has_drawn = True
+        self.drew_tile = True
+        self.record(DRAW, current_player.id, drawn_tile)
+        self.log_event("draw", player=current_player.id, tile=tile_name(drawn_tile))
         return drawn_tile
 
-    def get_tile_number(self, tile):
-        try:
-            return int(tile[0])
-        except ValueError:
-            return 0
-
-    def sort_numeric_tiles(self, tiles):
-        tiles.sort(key = self.get_tile_number)
-
-    def sort_tiles(self, hand):
-        # Sort in order of: B, C, D, Honors
-        bamboos = []
-        characters = []
-        dots = []
-        honors = []
-
-        for tile in hand:
-            if len(tile) == 2 and tile[1] == 'B':
-                bamboos.append(tile)
-            elif len(tile) == 2 and tile[1] == 'C':
-                characters.append(tile)
-            elif len(tile) == 2 and tile[1] == 'D':
-                dots.append(tile)
+    def interaction(self, discarded_tile, discarder_id):
+        # Settles claims on a discard with every seat answering straight away (console humans are
+        # asked on stdin). Returns True if the discard was claimed or won
+        window = self.open_claims(discarder_id - 1, discarded_tile)
+        while window is not None and self.claims is window:
+            player_id = window.waiting()[0]
+            kinds = window.options[player_id]
+            player = self.players[player_id - 1]
+            print(f"\nPlayer {player_id}, discarded tile is {tile_name(discarded_tile)}")
+            print(f"Your hand: {tile_names(player.hand_tiles())}")
+            choice = input(f"{' / '.join(kinds)} or Pass (enter): ").strip().lower()
+            if choice in kinds:
+                self.respond_claim(player_id, choice)
             else:
-                honors.append(tile) 
+                self.pass_on_claim(player_id, pass_code(kinds))
+        return self.winner is not None or self.just_ponged_chi
+
+    # Claim arbitration (see claims.py)
+
+    def open_claims(self, discarder_idx, tile, timeout=None):
+        # Opens the claim window on a discard. Bots answer now and human wins are taken for them;
+        # the window resolves as soon as the outcome is settled. Returns the window if it is still
+        # waiting on humans, else None
+        window = self.open_window(discarder_idx, tile)
+        for player_id, kinds in window.options.items():
+            player = self.players[player_id - 1]
+            if player_id in self.human_players:
+                if kinds[0] == "win":
+                    self.answer_claim(player_id, "win")
+                continue
+            self.answer_claim(player_id, next((kind for kind in kinds
+                                               if self.bot_claims(player, kind, tile, discarder_idx)), None))
+        if timeout is not None:
+            window.start_timer(timeout)
+        if window.decided():
+            self.resolve_claims()
+        return self.claims
+
+    def open_window(self, discarder_idx, tile):
+        # The window on a discard before anyone answers (replay.py reopens logged discards' windows with this)
+        window = ClaimWindow(tile, discarder_idx, legal_claims(self.players, discarder_idx, tile))
+        self.claims = window
+        self.last_discard = tile
+        self.last_discarder = discarder_idx
+        return window
+
+    def answer_claim(self, player_id, kind, code=None):
+        # Logs one seat's answer (kind, or None to pass) without resolving the window; code is the
+        # pass action to log, by default the one for the seat's options
+        window = self.claims
+        if window is None:
+            raise ClaimError(f"Player {player_id} has no claim to make")
+        window.respond(player_id, kind)
+        if kind is None:
+            self.record(code or pass_code(window.options[player_id]), player_id)
+        else:
+            self.record(CLAIM, player_id, CLAIM_KINDS.index(kind))
+
+    def respond_claim(self, player_id, kind):
+        # A human claiming the discard ("gang", "pong" or "chi"). Raises ClaimError if they can't
+        self.answer_claim(player_id, kind)
+        logger.debug("Player %s answers %s", player_id, kind)
+        if self.claims.decided():
+            self.resolve_claims()
+
+    def pass_on_claim(self, player_id, code):
+        # A human passing (code is PASS_PONG or PASS_CHI). Raises ClaimError if they had nothing to pass on
+        self.answer_claim(player_id, None, code)
+        logger.debug("Player %s passed", player_id)
+        self.log_event("pass", player=player_id, claim=ACTION_NAMES[code])
+        if self.claims.decided():
+            self.resolve_claims()
+
+    def expire_claims(self):
+        # Seats that haven't answered by the deadline pass
+        window = self.claims
+        if window is None or not window.expired():
+            return
+        for player_id in window.waiting():
+            self.answer_claim(player_id, None)
+        logger.debug("Claim window on %s timed out", tile_name(window.tile))
+        self.resolve_claims()
+
+    def resolve_claims(self):
+        # Applies the winning claim, or moves play on if nobody claims
+        window = self.claims
+        self.claims = None
+        best = window.best()
+        if best is None:
+            self.pass_claim()
+            return
+        player_id, kind = best
+        if kind == "win":
+            player = self.players[player_id - 1]
+            player.draw_tile(window.tile)
+            self.declare_win(player, window.tile)
+        elif kind == "gang":
+            self.claim_gang(player_id, window.tile)
+        elif kind == "pong":
+            self.claim_pong(player_id, window.tile)
+        else:
+            self.claim_chi(player_id, window.tile)
 
-        # Sort each category
-        self.sort_numeric_tiles(bamboos)
-        self.sort_numeric_tiles(characters)
-        self.sort_numeric_tiles(dots)
-        honors.sort() # Alphabetical order
+    def bot_claims(self, player, kind, tile, discarder_idx):
+        return self.policy(player).claim(self, player, kind, tile, discarder_idx)
 
-        return bamboos + characters + dots + honors
+    def get_chi_options(self, player_id: int):
+        # Chi melds the player can still answer the open claim window with
+        window = self.claims
+        if window is None or not window.can_claim(player_id, "chi"):
+            return []
+        return [sorted(pair + [window.tile]) for pair in find_valid_chis(self.players[player_id - 1].hand, window.tile)]
+
+    # Claims, passes and the end of the game. The server, the bots and replays all change the
+    # game through these, so every change lands in the action log
+
+    def claim_pong(self, player_id, tile):
+        logger.debug("Player %s calls PONG!", player_id)
+        self.log_event("pong", player=player_id, tile=tile_name(tile))
+        resolve_pong(self.players[player_id - 1], tile)
+        self.record(PONG, player_id, tile)
+        self.after_claim(player_id, tile)
+
+    def claim_chi(self, player_id, tile):
+        logger.debug("Player %s calls CHI!", player_id)
+        self.log_event("chi", player=player_id, tile=tile_name(tile))
+        resolve_chi(self.players[player_id - 1], tile)
+        self.record(CHI, player_id, tile)
+        self.after_claim(player_id, tile)
+
+    def claim_gang(self, player_id, tile):
+        logger.debug("Player %s calls GANG!", player_id)
+        self.log_event("gang", player=player_id, tile=tile_name(tile))
+        resolve_gang(self, self.players[player_id - 1], tile)
+        self.record(GANG, player_id, tile)
+        self.after_claim(player_id, tile)
+
+    def after_claim(self, player_id, tile):
+        self.danger.add_meld(player_id - 1, self.players[player_id - 1].exposed_hand[-1], tile)
+        self.remove_from_discard_pile(tile)
+        self.turn = player_id - 1
+        self.last_discard = None
+        self.last_discarder = -1
+        self.has_drawn = False
+        self.just_ponged_chi = True # The claimer discards next without drawing
 
-    def interaction(self, discarded_tile, discarder_id):
-        discarder_idx = discarder_id - 1
-        players = self.players
-        responders = players[discarder_idx + 1:] + players[:discarder_idx]
-
-        for responder in responders:
-            temp_hand = responder.hand.copy()
-            temp_hand.append(discarded_tile)
-            if check_win(temp_hand, responder.exposed_hand):
-                self.winner = responder
-                calculate_tai(responder)
-                print(f"Player {responder.id} wins by claiming {discarded_tile} from Player {discarder_id} with {responder.tai} Tai!")
-                break
+    def declare_concealed_gang(self, player_id, tile):
+        player = self.players[player_id - 1]
+        resolve_concealed_gang(self, player, tile)
+        self.danger.add_meld(player_id - 1, player.exposed_hand[-1])
+        self.record(CONCEALED_GANG, player_id, tile)
 
-        for responder in responders:
-            interactive = (responder.id in self.human_players)
-            # Anyone can Pong/Gang
-            if can_gang(responder.hand, discarded_tile):
-                if interactive:
-                    print(f"\nPlayer {responder.id}, discarded tile is {discarded_tile}")
-                    print(f"Your hand: {responder.hand}")
-                    choice = input("Gang (g) or Pass (enter): ").strip().lower()
-
-                    if choice != 'g':
-                        continue
-                    
-                print(f"Player {responder.id} calls GANG!")
-                resolve_gang(self,responder, discarded_tile)
-                self.turn = responder.id
-                return True
-
-            if can_pong(responder.hand, discarded_tile):
-                if interactive:
-                    print(f"\nPlayer {responder.id}, discarded tile is {discarded_tile}")
-                    print(f"Your hand: {responder.hand}")
-                    choice = input("Pong (p) or Pass (enter): ").strip().lower()
-
-                    if choice != 'p':
-                        continue
-                
-                print(f"Player {responder.id} calls PONG!")
-                resolve_pong(responder, discarded_tile)
-                self.turn = responder.id
-                return True
-            
-            # Only next player can Chi
-            next_player = responders[0]
-            next_player_id = next_player.id
-            interactive_chi = (next_player_id in self.human_players)
-            if can_chi(next_player.hand, discarded_tile):
-                if interactive_chi:
-                    print(f"\nPlayer {next_player_id}, discarded tile is {discarded_tile}")
-                    print(f"Your hand: {next_player.hand}")
-                    choice = input("Chi (c) or Pass (enter): ").strip().lower()
-
-                    if choice != 'c':
-                        return False
-                    
-                print(f"Player {next_player_id} calls CHI!")
-                resolve_chi(next_player, discarded_tile)
-                self.turn = next_player_id
-                return True
-
-        return False
-    
-    def get_pong_option(self, player_id: int):
-        tile = self.last_discard
-        if tile and can_pong(self.players[player_id-1].hand, tile):
-            return tile
-        return None
-    
-    def get_chi_options(self, player_id: int):
-        hand = self.players[player_id - 1].hand
-        discard = self.last_discard
-        options = []
-        if not discard or self.last_discarder == -1:
-            return options
-        
-        discarder_idx = self.last_discarder
-        next_player_idx = (discarder_idx + 1) % len(self.players)
-        next_player_id = next_player_idx + 1  
-        
-        if player_id != next_player_id:
-            return options
-            
-        for pair in find_valid_chis(hand, discard):
-            meld = sorted(pair + [discard], key=lambda t: (t[1], int(t[0])))
-            options.append(meld)
-        return options
-    
-    def pass_chi(self):
-        print("Player passed Chi")
+    def declare_addon_gang(self, player_id, tile):
+        resolve_addon_gang(self, self.players[player_id - 1], tile)
+        self.danger.add_tile(tile)
+        self.record(ADDON_GANG, player_id, tile)
+
+    def pass_chi(self, player_id=0):
+        self.pass_on_claim(player_id, PASS_CHI)
+
+    def pass_pong(self, player_id=0):
+        self.pass_on_claim(player_id, PASS_PONG)
+
+    def pass_claim(self):
+        # Nobody takes the discard, so play moves on to the next player
         self.last_discard = None
+        self.last_discarder = -1
+        self.turn = (self.turn + 1) % len(self.players)
+        self.has_drawn = False
 
-    def pass_pong(self):
-        print("Player passed Pong")
-        return 
+    def declare_win(self, player, discarded_tile=None):
+        # The winning tile is already in the player's hand; a claimed discard leaves the pile
+        player.zimo = discarded_tile is None
+        if discarded_tile is not None:
+            self.remove_from_discard_pile(discarded_tile)
+        self.winner = player
+        calculate_tai(player)
+        self.record(WIN, player.id, discarded_tile)
+        if player.zimo:
+            logger.info("Player %s wins by self-draw with %s Tai!", player.id, player.tai)
+        else:
+            logger.info("Player %s wins by claiming %s with %s Tai!", player.id, tile_name(discarded_tile), player.tai)
+        self.log_event("win", player=player.id, tile=None if player.zimo else tile_name(discarded_tile),
+                       tai=player.tai, breakdown=player.tai_breakdown, zimo=player.zimo)
+        self.log_event("action_log", log=self.action_log().hex())
+
+    def declare_draw(self):
+        logger.info("Wall exhausted — draw game.")
+        self.is_draw = True
+        self.record(DRAW_GAME)
+        self.log_event("draw_game")
+        self.log_event("action_log", log=self.action_log().hex())
     
     def remove_from_discard_pile(self, tile):
         if tile in self.discard_pile:
             self.discard_pile.remove(tile)
-            print(f"Removed {tile} from discard pile")
+            logger.debug("Removed %s from discard pile", tile_name(tile))
     
     def get_discard_pile(self):
         return self.discard_pile.copy()
@@ -230,99 +433,58 @@ class Game:
     def start_game(self):
         self.deal_tiles()
 
-        # # For Simulation 
+    def declare_bot_gangs(self, player):
+        # Declares the concealed and add-on Gangs the bot's policy wants (each draws a replacement tile)
+        policy = self.policy(player)
+        declared = True
+        while declared and self.wall:
+            declared = False
+            concealed_tiles = [tile for tile in can_concealed_gang(player.hand)
+                               if policy.gang(self, player, "concealed", tile)]
+            if concealed_tiles:
+                self.declare_concealed_gang(player.id, concealed_tiles[0])
+                declared = True
+                continue
+            addon_tiles = [tile for tile in can_addon_gang(player) if policy.gang(self, player, "addon", tile)]
+            if addon_tiles:
+                self.declare_addon_gang(player.id, addon_tiles[0])
+                declared = True
+
+    def play_bot_game(self):
+        # Plays a full game with no human input (for simulation). Returns the winner, or None on a draw
+        steps = self.bot_game_steps()
+        try:
+            player = next(steps)
+            while True:
+                player = steps.send(self.policy(player).discard(self, player))
+        except StopIteration:
+            pass
+        return self.winner
+
+    def bot_game_steps(self):
+        # play_bot_game as a generator for batched play (see policies.play_bot_games): yields each
+        # bot that has to discard and expects the tile back. Every other decision is made inline
+        self.deal_tiles()
+        claimed_tile = False
 
-        # print("\nStarting game turns...\n")
+        while self.winner is None:
+            current_player = self.players[self.turn]
 
-        # winner = None
-        # claimed_tile = False
+            if not claimed_tile:
+                if not self.wall or self.draw_tile() is None:
+                    break
+            self.declare_bot_gangs(current_player)
 
-        # while self.wall:
-        #     current_player = self.players[self.turn % 4]
-            
-        #     # Draw tile
-        #     if not claimed_tile:
-        #         drawn_tile = self.wall.pop()
-
-        #         while drawn_tile.startswith("Flower") or drawn_tile.startswith("Season") or drawn_tile in ['Cat', 'Mouse', 'Chicken', 'Centipede']:
-        #             handle_bonus_tile(current_player, drawn_tile)
-        #             print(f"Player {current_player.id} draws bonus tile {drawn_tile}, replacing...")
-        #             if self.wall:
-        #                 drawn_tile = self.wall.pop()
-        #             else: 
-        #                 break
-
-        #         current_player.draw_tile(drawn_tile)
-
-        #         # Check for win (after drawing tile)
-        #         if current_player.has_won():
-        #             winner = current_player
-        #             calculate_tai(current_player)
-        #             print(f"Player {current_player.id} wins after drawing {drawn_tile} with Tai: {current_player.tai}!")
-        #             break
-        #     else:
-        #         drawn_tile = None  
-
-        #     interactive = (current_player.id == self.interactive_player_id)
-
-        #     concealed_tiles = can_concealed_gang(current_player.hand)
-        #     if concealed_tiles:
-        #         print(f"\nPlayer {current_player.id}, you can declare a concealed Gang with: {concealed_tiles}")
-        #         print(f"Your hand: {current_player.hand}")
-        #         if current_player.id == self.interactive_player_id:
-        #             choice = input("Declare concealed Gang? Enter tile or press Enter to skip: ")
-        #             if choice in concealed_tiles:
-        #                 resolve_concealed_gang(self, current_player, choice)
-        #         else:
-        #             resolve_concealed_gang(self, current_player, concealed_tiles[0])
-
-        #     addon_tiles = can_addon_gang(current_player)
-        #     if addon_tiles:
-        #         print(f"\nPlayer {current_player.id}, you can declare upgrade to Gang with: {addon_tiles}")
-        #         print(f"Your hand: {current_player.hand}")
-        #         if current_player.id == self.interactive_player_id:
-        #             choice = input("Upgrade to Gang? Enter tile or press Enter to skip: ")
-        #             if choice in addon_tiles:
-        #                 resolve_addon_gang(self, current_player, choice)
-        #         else:
-        #             resolve_addon_gang(self, current_player, addon_tiles[0])
-
-        #     discarded_tile = current_player.discard_tile(interactive)
-
-        #     current_player.hand = sort_tiles(current_player.hand)  
-        #     if drawn_tile:
-        #         print(f"Turn {self.turn + 1}: Player {current_player.id} draws {drawn_tile}, discards {discarded_tile}")
-        #         print(current_player)
-        #     else:
-        #         print(f"Turn {self.turn + 1}: Player {current_player.id} (claimed tile) discards {discarded_tile}")
-        #         print(current_player)
-
-        #     while self.interaction(discarded_tile, current_player.id):
-        #         # Logic for discarding tiles after claiming
-
-        #         claimed_tile = True
-        #         current_player = self.players[self.turn - 1]
-        #         interactive = (current_player.id == self.interactive_player_id)
-
-        #         discarded_tile = current_player.discard_tile(interactive)
-        #         current_player.hand = sort_tiles(current_player.hand)
-
-        #         print(f"Turn {self.turn + 1}: Player {current_player.id} (claimed tile) discards {discarded_tile}")
-
-        #         # if self.interaction(discarded_tile, current_player.id):
-        #         #     claimed_tile = True
-        #         #     continue
-        #         # else:
-        #         #     claimed_tile = False
-        #         # continue
-        #     # else:
-        #     claimed_tile = False
-
-        #     self.turn += 1
-
-        # if not winner:
-        #     print("\nNo winner — wall exhausted.")
-
-        # print("\nFinal hands:")
-        # for player in self.players:
-        #     print(player)
+            # Self-draw win, only on a tile just drawn from the wall or as a Gang replacement (not
+            # straight after a Pong or Chi)
+            if self.drew_tile and can_win(current_player):
+                self.declare_win(current_player)
+                break
+
+            discarded_tile = self.bot_discard((yield current_player))
+            if discarded_tile is None:
+                break
+            claimed_tile = self.interaction(discarded_tile, current_player.id) # Moves the turn on either way
+
+        if self.winner is None:
+            self.declare_draw()
@@ -0,0 +1,72 @@
+"""
+logs.py:
+
+Logging setup. Every module logs through its own logger; records go through a queue and are written
+by a background thread, so request threads never block on stdout. Hand dumps are logged at DEBUG
+and stay off unless LOG_LEVEL=DEBUG.
+
+Set GAME_EVENT_LOG to a directory to also write a structured JSON event log per game
+(<directory>/<game id>.jsonl, one event per line).
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+event_logger = logging.getLogger("events")
+event_logger.propagate = False # Game events only go to the per-game files
+
+class GameEventHandler(logging.Handler):
+    # Appends each event record to its game's JSON lines file
+    def __init__(self, directory):
+        super().__init__()
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def emit(self, record):
+        try:
+            path = os.path.join(self.directory, f"{record.game_id}.jsonl")
+            with open(path, "a") as f:
+                f.write(record.getMessage() + "\n")
+        except Exception:
+            self.handleError(record)
+
+def setup_logging(level=None, event_directory=None):
+    level = level or os.getenv("LOG_LEVEL", "INFO")
+    event_directory = event_directory or os.getenv("GAME_EVENT_LOG")
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [stream_handler]
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+
+    if event_directory:
+        event_handler = GameEventHandler(event_directory)
+        event_handler.addFilter(lambda record: record.name == "events")
+        handlers.append(event_handler)
+        event_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+        event_logger.setLevel(logging.INFO)
+    else:
+        event_logger.setLevel(logging.CRITICAL + 1)
+    stream_handler.addFilter(lambda record: record.name != "events")
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+def log_game_event(game_id, event, **fields):
+    # Serialised lazily: nothing is built unless the event log is enabled
+    if event_logger.isEnabledFor(logging.INFO):
+        fields.update(game=game_id, event=event, time=time.time())
+        event_logger.info(json.dumps(fields), extra={"game_id": game_id})
@@ -0,0 +1,134 @@
+"""
+metrics.py:
+
+Lightweight in-process metrics (counters, gauges and latency histograms), rendered in the Prometheus
+text format by the /metrics endpoint. Kept dependency-free so the game engine can time itself
+without pulling in a client library.
+"""
+
+import bisect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Latency buckets in seconds, from rule checks (microseconds) up to slow requests
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+REGISTRY = []
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self):
+        return [f"{self.name} {self.value}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self.lock:
+            self.value = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label=None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label # Optional single label, e.g. the route name
+        self.buckets = buckets
+        self.series = {} # Label value -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, seconds, label_value=None):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self.lock:
+            series = self.series.get(label_value)
+            if series is None:
+                series = self.series[label_value] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    @contextmanager
+    def time(self, label_value=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, label_value)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            series_items = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        for label_value, counts, total, count in series_items:
+            labels = f'{self.label}="{label_value}"' if self.label else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{{{labels + ',' if labels else ''}{le}}} {cumulative}")
+            lines.append(f"{self.name}_bucket{{{labels + ',' if labels else ''}le=\"+Inf\"}} {count}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+def timed(histogram, label_value=None, sample=1):
+    # Decorator recording each call's duration in the histogram. For functions too hot to time on
+    # every call, sample=N only times every Nth call, and sample=0 turns timing off
+    def decorator(func):
+        if sample <= 0:
+            return func
+        calls = itertools.count()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if sample > 1 and next(calls) % sample:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, label_value)
+        return wrapper
+    return decorator
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Metrics shared across modules
+
+RULE_LATENCY = Histogram("mahjong_rule_seconds", "Time spent in rule evaluation", label="rule")
+BOT_LATENCY = Histogram("mahjong_bot_decision_seconds", "Time spent choosing a bot action", label="decision")
+SERIALISE_LATENCY = Histogram("mahjong_state_serialise_seconds", "Time spent building game_state payloads")
+ROUTE_LATENCY = Histogram("mahjong_request_seconds", "Time spent handling each /api route", label="route")
+
+GAMES_STARTED = Counter("mahjong_games_started_total", "Games started")
+GAMES_FINISHED = Counter("mahjong_games_finished_total", "Games finished (win or draw)")
+DISCARDS = Counter("mahjong_discards_total", "Tiles discarded")
+ACTIVE_SOCKETS = Gauge("mahjong_active_sockets", "Connected Socket.IO clients")
@@ -4,39 +4,114 @@ Player Class:
 Updates individual tiles (e.g. drawing, discarding)
 """
 from bot import smart_discard
-from rules import check_win
+from rules import tile_group, group_status, group_waits, collect_waits
+from tiles import NUM_TILE_TYPES, tiles_from_hand, tile_names
 
 class Player:
+    __slots__ = (
+        "id", "hand", "exposed_hand", "bonus_tiles", "tai", "tai_breakdown", "concealed_gangs", "zimo",
+        "waits", "group_statuses", "group_waits"
+    )
+
     def __init__(self, player_id):
         self.id = player_id
-        self.hand = []
+        self.hand = [0] * NUM_TILE_TYPES # Count vector indexed by tile id
         self.exposed_hand = [] # Set of completed sets (for Chi, Gang, Pong)
         self.bonus_tiles = []
         self.tai = 0
+        self.tai_breakdown = [] # (pattern, tai) items, filled in when the player wins
+        self.concealed_gangs = [] # Gangs in exposed_hand that were declared from the concealed hand
         self.zimo = False
 
+        # Tiles that would complete the hand, kept up to date per group as the hand changes
+        self.waits = set()
+        self.group_statuses = [group_status(self.hand, group) for group in range(4)]
+        self.group_waits = [group_waits(self.hand, group) for group in range(4)]
+
+    def update_waits(self, tile):
+        group = tile_group(tile)
+        self.group_statuses[group] = group_status(self.hand, group)
+        self.group_waits[group] = group_waits(self.hand, group)
+        self.waits = collect_waits(self.group_statuses, self.group_waits)
+
     def draw_tile(self, tile):
-        self.hand.append(tile)
+        self.hand[tile] += 1
+        self.update_waits(tile)
+
+    def refresh_waits(self):
+        self.group_statuses = [group_status(self.hand, group) for group in range(4)]
+        self.group_waits = [group_waits(self.hand, group) for group in range(4)]
+        self.waits = collect_waits(self.group_statuses, self.group_waits)
+
+    def draw_tiles(self, tiles):
+        # Adds several tiles (e.g. the deal) and refreshes the waits once
+        for tile in tiles:
+            self.hand[tile] += 1
+        self.refresh_waits()
+
+    def remove_tile(self, tile, count=1):
+        self.hand[tile] -= count
+        self.update_waits(tile)
     
     def discard_tile(self, interactive, discarded_tile=None):
         # If player is human, discarded tile can be chosen. Else, apply bot discard logic
-        if not self.hand:
+        if not any(self.hand):
             return None
         
-        if interactive:
-            self.hand.remove(discarded_tile)
-        else:
-            self.hand.remove(smart_discard(self.hand)) # Bot discard logic
+        if not interactive:
+            discarded_tile = smart_discard(self.hand) # Bot discard logic
+        self.remove_tile(discarded_tile)
+        return discarded_tile
+
+    def hand_tiles(self):
+        # Concealed hand as a sorted list of tile ids
+        return tiles_from_hand(self.hand)
+
+    def hand_size(self):
+        return sum(self.hand)
         
-    def has_won(self):
-        full_hand = self.hand.copy()
-        for group in self.exposed_hand:
-            full_hand.extend(group)
-        return check_win(self.hand, self.exposed_hand) and self.tai != 0
+    def clone(self):
+        # Independent copy for lookahead and simulation. Waits and per-group results are replaced
+        # rather than mutated when the hand changes, so they can be shared
+        other = Player.__new__(Player)
+        other.id = self.id
+        other.hand = self.hand.copy()
+        other.exposed_hand = [group.copy() for group in self.exposed_hand]
+        other.bonus_tiles = self.bonus_tiles.copy()
+        other.tai = self.tai
+        other.tai_breakdown = self.tai_breakdown.copy()
+        other.concealed_gangs = self.concealed_gangs.copy()
+        other.zimo = self.zimo
+        other.waits = self.waits
+        other.group_statuses = self.group_statuses.copy()
+        other.group_waits = self.group_waits.copy()
+        return other
+
+    def snapshot(self):
+        # Immutable copy of the player's state; waits are derived from the hand on restore
+        return (
+            self.id, bytes(self.hand), tuple(tuple(group) for group in self.exposed_hand),
+            tuple(self.bonus_tiles), self.tai, tuple(self.tai_breakdown), tuple(self.concealed_gangs), self.zimo
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        player_id, hand, exposed_hand, bonus_tiles, tai, tai_breakdown, concealed_gangs, zimo = snapshot
+        player = cls.__new__(cls)
+        player.id = player_id
+        player.hand = list(hand)
+        player.exposed_hand = [list(group) for group in exposed_hand]
+        player.bonus_tiles = list(bonus_tiles)
+        player.tai = tai
+        player.tai_breakdown = [tuple(item) for item in tai_breakdown]
+        player.concealed_gangs = list(concealed_gangs)
+        player.zimo = zimo
+        player.refresh_waits()
+        return player
 
     def __str__(self):
         return (f"Player {self.id}:\n"
-                f"Hand: {self.hand}\n"
-                f"Exposed: {self.exposed_hand}\n"
-                f"Bonus: {self.bonus_tiles}\n"
-                f"Tai: {self.tai}")
\ No newline at end of file
+                f"Hand: {tile_names(self.hand_tiles())}\n"
+                f"Exposed: {[tile_names(group) for group in self.exposed_hand]}\n"
+                f"Bonus: {tile_names(self.bonus_tiles)}\n"
+                f"Tai: {self.tai}")
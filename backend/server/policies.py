@@ -0,0 +1,140 @@
+"""
+policies.py:
+
+Handles how bot seats make their decisions. A BotPolicy answers every choice a bot faces:
+which tile to discard, whether to claim a discard (win, gang, pong or chi) and whether to declare
+a concealed or add-on gang. Policies are registered by name, and each game keeps one policy per seat,
+so tables (and seats within a table) can mix bot tiers.
+
+Discards also have a batched form: play_bot_games runs many bot-only games in lockstep and hands
+every table's pending discard to the policy in one discard_batch call, so a vectorised or learned
+policy can evaluate hundreds of seats at once.
+"""
+
+import logging
+from importlib.util import find_spec
+
+from bot import lookahead_claim, lookahead_discard, safer_discard, smart_discard
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = "basic"
+
+POLICIES = {} # Name -> policy instance
+
+def register_policy(cls):
+    # Class decorator: makes the policy available to games under its name
+    POLICIES[cls.name] = cls()
+    return cls
+
+def get_policy(name):
+    try:
+        policy = POLICIES[name]
+    except KeyError:
+        raise ValueError(f"Unknown bot policy {name!r} (expected one of {sorted(POLICIES)})") from None
+    if policy.unavailable:
+        raise ValueError(f"Bot policy {name!r} is unavailable: {policy.unavailable}")
+    return policy
+
+def resolve_policy(policy):
+    # A BotPolicy object as is, or the registered policy of that name
+    return policy if isinstance(policy, BotPolicy) else get_policy(policy)
+
+class BotPolicy:
+    # Interface for bot policies. Seats are players (1-4), discarder_idx is 0-based, and
+    # discard_batch takes a list of discard's arguments; by default it just loops
+    name = None
+    unavailable = None # Why the policy can't run in this process (e.g. a missing optional dependency)
+
+    def discard(self, game, player):
+        # Tile id to discard from player.hand
+        raise NotImplementedError
+
+    def claim(self, game, player, kind, tile, discarder_idx):
+        # Whether to claim the discard; kind is "win", "gang", "pong" or "chi"
+        raise NotImplementedError
+
+    def gang(self, game, player, kind, tile):
+        # Whether to declare a gang on the tile; kind is "concealed" or "addon"
+        raise NotImplementedError
+
+    def discard_batch(self, requests):
+        return [self.discard(game, player) for game, player in requests]
+
+@register_policy
+class BasicPolicy(BotPolicy):
+    # Most efficient discard, swapped for a safer one when it risks dealing in; takes every claim and gang
+    name = "basic"
+
+    def discard(self, game, player):
+        return smart_discard(player.hand, game.danger, player.id - 1)
+
+    def claim(self, game, player, kind, tile, discarder_idx):
+        return True
+
+    def gang(self, game, player, kind, tile):
+        return True
+
+@register_policy
+class LookaheadPolicy(BasicPolicy):
+    # Monte Carlo lookahead for discards and pong/chi/gang claims (see bot.py); always takes a win
+    name = "lookahead"
+
+    def discard(self, game, player):
+        return lookahead_discard(game, player)
+
+    def claim(self, game, player, kind, tile, discarder_idx):
+        if kind == "win":
+            return True
+        return lookahead_claim(game, player, kind, tile, discarder_idx)
+
+@register_policy
+class VectorisedPolicy(BasicPolicy):
+    # Same decisions as the basic policy, with batched discards worked out by batch.py in one
+    # NumPy pass over every hand. Needs NumPy
+    name = "vectorised"
+
+    def __init__(self):
+        if find_spec("numpy") is None:
+            self.unavailable = "needs NumPy (pip install numpy)"
+
+    def discard(self, game, player):
+        return self.discard_batch([(game, player)])[0]
+
+    def discard_batch(self, requests):
+        from batch import best_discard_batch # Optional NumPy dependency, only loaded when used
+        tiles, shanten, ukeire = best_discard_batch([player.hand for game, player in requests])
+        discards = []
+        for (game, player), tile in zip(requests, tiles.tolist()):
+            if tile < 0:
+                discards.append(None)
+            else:
+                discards.append(safer_discard(player.hand, tile, game.danger, player.id - 1))
+        return discards
+
+def play_bot_games(games):
+    # Plays bot-only games in lockstep. Each round collects the pending discard of every unfinished
+    # table, groups them by policy and answers each group with one discard_batch call.
+    # Returns each game's winner (None for a draw)
+    pending = {} # Game index -> (steps generator, player waiting on a discard)
+    for i, game in enumerate(games):
+        steps = game.bot_game_steps()
+        player = next(steps, None)
+        if player is not None:
+            pending[i] = (steps, player)
+
+    while pending:
+        groups = {} # Policy -> game indices
+        for i, (steps, player) in pending.items():
+            groups.setdefault(games[i].policy(player), []).append(i)
+
+        for policy, indices in groups.items():
+            tiles = policy.discard_batch([(games[i], pending[i][1]) for i in indices])
+            for i, tile in zip(indices, tiles):
+                steps = pending[i][0]
+                try:
+                    pending[i] = (steps, steps.send(tile))
+                except StopIteration:
+                    del pending[i]
+        logger.debug("Batched discards for %s table(s)", sum(len(indices) for indices in groups.values()))
+    return [game.winner for game in games]
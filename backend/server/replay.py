@@ -0,0 +1,153 @@
+"""
+replay.py:
+
+Rebuilds game states from a seed and an action log (see actions.py). The seed fixes the wall, so
+re-applying the logged actions reproduces every state of the game, including ones from production
+(the server writes each finished game's log as an "action_log" event when GAME_EVENT_LOG is set).
+Every discard's claim window is reopened and fed the logged answers, so states with a window still
+waiting on a seat come back too (without its deadline, which restarts when a table resumes).
+Snapshots are taken every SNAPSHOT_INTERVAL actions as the log is replayed, so reaching any later
+action only re-applies the few actions since the nearest snapshot.
+
+Usage: python replay.py <action log hex or events .jsonl file> [--at N]
+"""
+
+import argparse
+import json
+
+from actions import (
+    ACTION_SIZE, DEAL, DRAW, DISCARD, PONG, CHI, GANG, CONCEALED_GANG, ADDON_GANG, PASS_PONG, PASS_CHI,
+    WIN, DRAW_GAME, CLAIM, NO_TILE, describe, unpack_log
+)
+from claims import CLAIM_KINDS
+from game import Game
+from tiles import tile_names
+
+SNAPSHOT_INTERVAL = 32 # Actions between snapshots
+
+class ReplayError(Exception):
+    pass
+
+def settle(game):
+    # A window nobody claims closes once every seat has passed, as it does live. A claim is left for
+    # the claim action logged after it
+    window = game.claims
+    if window is not None and window.decided() and window.best() is None:
+        game.resolve_claims()
+
+def apply_action(game, code, player_id, tile):
+    # Re-applies one logged action through the same Game methods that recorded it
+    if code == DEAL:
+        game.deal_tiles()
+    elif code == DRAW:
+        game.turn = player_id - 1
+        game.last_discard = None
+        game.claims = None # Logs from before answers were recorded leave bots' windows open
+        drawn_tile = game.draw_tile()
+        if drawn_tile != tile:
+            raise ReplayError(f"Player {player_id} drew {drawn_tile}, but the log has {tile}")
+    elif code == DISCARD:
+        game.discard_tile(player_id, tile)
+        game.open_window(player_id - 1, tile)
+        settle(game)
+    elif code == CLAIM:
+        game.answer_claim(player_id, CLAIM_KINDS[tile])
+    elif code in (PASS_PONG, PASS_CHI):
+        game.answer_claim(player_id, None, code)
+        settle(game)
+    elif code == PONG:
+        game.claims = None # The logged claim settles the window
+        game.claim_pong(player_id, tile)
+    elif code == CHI:
+        game.claims = None
+        game.claim_chi(player_id, tile)
+    elif code == GANG:
+        game.claims = None
+        game.claim_gang(player_id, tile)
+    elif code == CONCEALED_GANG:
+        game.declare_concealed_gang(player_id, tile)
+    elif code == ADDON_GANG:
+        game.declare_addon_gang(player_id, tile)
+    elif code == WIN:
+        player = game.players[player_id - 1]
+        if tile is not None:
+            game.claims = None
+            player.draw_tile(tile)
+        game.declare_win(player, tile)
+    elif code == DRAW_GAME:
+        game.declare_draw()
+    else:
+        raise ReplayError(f"Unknown action code {code}")
+
+class Replay:
+    def __init__(self, seed, human_players, actions, interval=SNAPSHOT_INTERVAL):
+        self.seed = seed
+        self.human_players = human_players
+        self.actions = bytes(actions)
+        self.interval = interval
+        self.snapshots = {0: Game(human_players=human_players, seed=seed).snapshot()} # Action count -> snapshot
+
+    @classmethod
+    def from_log(cls, data, interval=SNAPSHOT_INTERVAL):
+        seed, human_players, actions = unpack_log(data)
+        return cls(seed, human_players, actions, interval)
+
+    def __len__(self):
+        return len(self.actions) // ACTION_SIZE
+
+    def state_at(self, count=None):
+        # The game after the first count actions (all of them by default)
+        count = len(self) if count is None else count
+        if not 0 <= count <= len(self):
+            raise IndexError(f"Action {count} is outside the log (0-{len(self)})")
+
+        start = count - count % self.interval
+        while start not in self.snapshots:
+            start -= self.interval
+        game = Game.from_snapshot(self.snapshots[start])
+
+        for index in range(start, count):
+            offset = index * ACTION_SIZE
+            code, player_id, tile = self.actions[offset:offset + ACTION_SIZE]
+            apply_action(game, code, player_id, None if tile == NO_TILE else tile)
+            if (index + 1) % self.interval == 0:
+                self.snapshots.setdefault(index + 1, game.snapshot())
+        return game
+
+def read_log(source):
+    # A packed log from hex, or the last "action_log" event of a per-game events file
+    if source.endswith(".jsonl"):
+        log = None
+        with open(source) as f:
+            for line in f:
+                event = json.loads(line)
+                if event.get("event") == "action_log":
+                    log = event["log"]
+        if log is None:
+            raise ReplayError(f"No action_log event in {source}")
+        source = log
+    return bytes.fromhex(source)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a game from its action log")
+    parser.add_argument("log", help="Action log as hex, or a per-game events .jsonl file")
+    parser.add_argument("--at", type=int, help="Show the state after this many actions (default: the end)")
+    parser.add_argument("--actions", action="store_true", help="Print every action in the log")
+    args = parser.parse_args()
+
+    replay = Replay.from_log(read_log(args.log))
+    if args.actions:
+        for index, action in enumerate(describe(replay.actions)):
+            print(index, action)
+
+    game = replay.state_at(args.at)
+    print(f"Seed {replay.seed}, {len(replay)} actions, state after {len(replay) if args.at is None else args.at}")
+    print(f"Turn: Player {game.turn + 1}, wall: {len(game.wall)} tiles")
+    print(f"Discard pile: {tile_names(game.discard_pile)}")
+    for player in game.players:
+        print(player)
+    if game.winner:
+        print(f"Winner: Player {game.winner.id} with {game.winner.tai} Tai")
+
+if __name__ == "__main__":
+    main()
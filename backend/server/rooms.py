@@ -0,0 +1,236 @@
+"""
+rooms.py:
+
+Keeps track of game rooms (tables), so one server process can host many games at once. With a
+GameStore, every published state is checkpointed and rooms missing from memory are restored from it
+"""
+
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+
+from game import Game
+from metrics import GAMES_FINISHED, GAMES_STARTED
+from policies import get_policy
+
+logger = logging.getLogger(__name__)
+
+BOT_POLICY = os.getenv("BOT_POLICY", "basic") # Policy for bot seats in rooms that don't choose one (see policies.py)
+get_policy(BOT_POLICY) # A bad or unavailable BOT_POLICY fails at startup rather than when the first game starts
+
+MAX_HUMANS = 4
+
+SNAPSHOT_HISTORY = 32 # Published states kept per room, so clients that fall behind can catch up with a delta
+
+def diff_state(old, new):
+    # Delta between two published game_state payloads: changed keys, removed keys, and tiles
+    # appended to the discard pile (which only grows between claims)
+    delta = {"delta": True, "version": new["version"], "base_version": old["version"]}
+    for key, value in new.items():
+        if key == "version" or old.get(key) == value:
+            continue
+        old_pile = old.get(key)
+        if key == "discard_pile" and old_pile is not None and value[:len(old_pile)] == old_pile:
+            delta["discard_pile_append"] = value[len(old_pile):]
+        else:
+            delta[key] = value
+    removed = [key for key in old if key not in new]
+    if removed:
+        delta["removed"] = removed
+    return delta
+
+def parse_num_humans(value):
+    # numHumans from a client as an int from 1 to MAX_HUMANS; raises ValueError otherwise
+    try:
+        num_humans = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"numHumans must be a whole number, got {value!r}") from None
+    if not 1 <= num_humans <= MAX_HUMANS:
+        raise ValueError(f"numHumans must be between 1 and {MAX_HUMANS}, got {num_humans}")
+    return num_humans
+
+class Room:
+    def __init__(self, room_id, num_humans, store=None, bot_policy=None):
+        self.id = room_id
+        self.num_humans = num_humans
+        self.bot_policy = bot_policy or BOT_POLICY
+        self.store = store
+        self.game = None
+        self.restored = False # Game came back from a checkpoint and is waiting for its humans to rejoin
+        self.socket_to_player = {} # Socket id -> player slot (0-based)
+        self.lock = threading.RLock() # Held while a request reads or changes this room's game
+        self.loop_running = False # Whether the background game loop is running for this room
+        self.needs_step = False
+        self.watched_claims = None # Claim window with a timeout task running
+        self.snapshots = deque(maxlen=SNAPSHOT_HISTORY) # (version, payload) of recently published states
+
+    def joined(self):
+        return len(self.socket_to_player)
+
+    def needed(self):
+        return self.num_humans - self.joined()
+
+    def is_open(self):
+        return (self.game is None or self.restored) and self.joined() < self.num_humans
+
+    def add_player(self, sid, slot=None):
+        # Seats the socket in the given slot (a player rejoining their seat), or the lowest free one.
+        # Returns the slot, or None if the requested one is taken or out of range
+        taken = set(self.socket_to_player.values())
+        if slot is None:
+            slot = next(free for free in range(self.num_humans) if free not in taken)
+        elif not 0 <= slot < self.num_humans or slot in taken:
+            return None
+        self.socket_to_player[sid] = slot
+        return slot
+
+    def remove_player(self, sid):
+        return self.socket_to_player.pop(sid, None)
+
+    def publish(self, payload):
+        # Records a new game_state payload under the next version. Returns the update to push
+        # (a delta against the previous version, or the full payload), or None if nothing changed
+        previous = self.snapshots[-1][1] if self.snapshots else None
+        if previous is not None and {**payload, "version": previous["version"]} == previous:
+            return None
+
+        if ("winner" in payload or "draw" in payload) and (previous is None or previous.keys() != payload.keys()):
+            GAMES_FINISHED.inc()
+
+        self.game.version += 1
+        payload["version"] = self.game.version
+        self.snapshots.append((self.game.version, payload))
+        self.checkpoint(payload)
+        if previous is None:
+            return payload
+        return diff_state(previous, payload)
+
+    def checkpoint(self, payload):
+        # Finished games are dropped from the store; anything else is saved for a restart
+        if self.store is None:
+            return
+        if "winner" in payload or "draw" in payload:
+            self.store.delete(self.id)
+        else:
+            self.store.save(self.id, self.num_humans, self.game.version, self.game.snapshot())
+
+    def state_since(self, version):
+        # Latest payload as a delta from the given version if it is still in the history, else in full
+        if not self.snapshots:
+            return None
+        latest = self.snapshots[-1][1]
+        for snapshot_version, payload in self.snapshots:
+            if snapshot_version == version:
+                return diff_state(payload, latest)
+        return latest
+
+    def start_game(self):
+        human_players = list(range(1, self.num_humans + 1))
+        policies = {player_id: self.bot_policy for player_id in range(self.num_humans + 1, 5)}
+        self.game = Game(human_players=human_players, policies=policies)
+        self.game.start_game()
+        self.snapshots.clear()
+        GAMES_STARTED.inc()
+        return self.game
+
+class RoomRegistry:
+    def __init__(self, store=None):
+        self.rooms = {}
+        self.socket_rooms = {} # Socket id -> room id
+        self.store = store
+        self.lock = threading.RLock()
+
+    def get(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is None and room_id and self.store is not None:
+            room = self.restore(room_id)
+        return room
+
+    def restore(self, room_id):
+        # Brings a checkpointed room back into memory, with every human seat free to rejoin
+        with self.lock:
+            room = self.rooms.get(room_id)
+            if room is not None:
+                return room
+            saved = self.store.load(room_id)
+            if saved is None:
+                return None
+            num_humans, game = saved
+            # Bots sit after the humans, so the first bot seat has the room's policy
+            bot_policy = game.policies[num_humans] if num_humans < len(game.policies) else None
+            room = Room(room_id, num_humans, self.store, bot_policy)
+            room.game = game
+            room.restored = True
+            self.rooms[room_id] = room
+            logger.info("Restored room %s from checkpoint at version %s", room_id, game.version)
+            return room
+
+    def create_room(self, num_humans, bot_policy=None):
+        # Raises ValueError for a bad number of humans or an unknown bot policy
+        num_humans = parse_num_humans(num_humans)
+        if bot_policy is not None:
+            get_policy(bot_policy)
+        with self.lock:
+            room = Room(uuid.uuid4().hex[:8], num_humans, self.store, bot_policy)
+            self.rooms[room.id] = room
+            return room
+
+    def join(self, sid, num_humans, room_id=None, slot=None):
+        # Seats a socket in the given room (in the given slot, if any), or matchmakes it into an open
+        # room for the same number of humans (creating one if needed). Returns (room, slot), or (None, None)
+        with self.lock:
+            if room_id is not None:
+                room = self.get(room_id)
+                if room is None or not room.is_open():
+                    return None, None
+            else:
+                slot = None # Seats are only chosen when rejoining a known room
+                room = next((r for r in self.rooms.values()
+                             if r.num_humans == num_humans and r.is_open() and not r.restored), None)
+                if room is None:
+                    room = self.create_room(num_humans)
+
+            slot = room.add_player(sid, slot)
+            if slot is None:
+                return None, None
+            self.socket_rooms[sid] = room.id
+            return room, slot
+
+    def leave(self, sid):
+        # Removes a socket from its room, closing the room and dropping its checkpoint once nobody
+        # is left in it
+        with self.lock:
+            room = self.rooms.get(self.socket_rooms.pop(sid, None))
+            if room is None:
+                return None
+            room.remove_player(sid)
+            if not room.socket_to_player:
+                del self.rooms[room.id]
+                with room.lock: # So the game loop can't checkpoint the game again after the delete
+                    room.game = None
+                    if self.store is not None:
+                        self.store.delete(room.id)
+            return room
+
+    def remove_room(self, room_id):
+        with self.lock:
+            room = self.rooms.pop(room_id, None)
+            if self.store is not None:
+                self.store.delete(room_id)
+            if room is not None:
+                room.game = None # Stops the room's game loop
+                for sid in room.socket_to_player:
+                    self.socket_rooms.pop(sid, None)
+            return room
+
+    def list_rooms(self):
+        with self.lock:
+            return [{
+                "room_id": room.id,
+                "num_humans": room.num_humans,
+                "joined": room.joined(),
+                "started": room.game is not None,
+                "bot_policy": room.bot_policy,
+            } for room in self.rooms.values()]
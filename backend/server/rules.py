@@ -2,131 +2,359 @@
 rules.py:
 
 Handles game logic such as win checking and Tai calculations
+
+Hands are count vectors indexed by tile id (see tiles.py), so Pong/Chi/Gang
+checks are direct lookups instead of list scans.
 """
 
-from collections import Counter
+import logging
+import os
+
+from cache import MISSING, HandCache, cached_by_hand
+from metrics import RULE_LATENCY, timed
+from tiles import (
+    NUM_TILE_TYPES, HONOR_START, FLOWER_START, SEASON_START, ANIMAL_START,
+    is_bonus, is_suited, tile_name, tile_names
+)
+
+logger = logging.getLogger(__name__)
+
+CHECK_WIN_SAMPLE = int(os.environ.get("CHECK_WIN_SAMPLE", 64)) # Time one in this many win checks (0: never)
 
 def handle_bonus_tile(player, tile):
     player.bonus_tiles.append(tile)
+    # Running total of bonus Tai; the full score replaces it when the player wins
+    player.tai = sum(tai for name, tai in bonus_tai(player.bonus_tiles, player.id))
+
+def bonus_tai(bonus_tiles, seat):
+    # Animals score 1 each. A Flower / Season matching the seat scores 1, or 2 for the full set of four
+    items = []
+    for start, kind in ((FLOWER_START, "Flower"), (SEASON_START, "Season")):
+        held = [tile for tile in bonus_tiles if start <= tile < start + 4]
+        if len(held) == 4:
+            items.append((f"All {kind}s", 2))
+        elif start + seat - 1 in held:
+            items.append((f"Seat {kind}", 1))
+    for tile in bonus_tiles:
+        if tile >= ANIMAL_START:
+            items.append((tile_name(tile), 1))
+    return items
 
-    # Animal
-    if tile in ['Cat', 'Mouse', 'Chicken', 'Centipede']:
-        player.tai += 1
+# Winning Logic
+
+# Every suit shape (count vector of one suit, as bytes) that splits into melds only, or melds plus
+# exactly one pair. Built once at import, so win checks are a few set lookups instead of a search
+def build_suit_tables():
+    melds = [[i, i, i] for i in range(9)] + [[i, i + 1, i + 2] for i in range(7)]
+    meld_shapes = {bytes(9)}
+    frontier = [(bytes(9), 0)]
+
+    # Add melds in non-decreasing order so each combination is only generated once
+    for depth in range(4):
+        next_frontier = []
+        for shape, first_meld in frontier:
+            for m in range(first_meld, len(melds)):
+                counts = bytearray(shape)
+                for i in melds[m]:
+                    counts[i] += 1
+                if max(counts) > 4:
+                    continue
+                key = bytes(counts)
+                meld_shapes.add(key)
+                next_frontier.append((key, m))
+        frontier = next_frontier
+
+    pair_shapes = set()
+    for shape in meld_shapes:
+        for i in range(9):
+            if shape[i] <= 2:
+                counts = bytearray(shape)
+                counts[i] += 2
+                pair_shapes.add(bytes(counts))
+
+    return frozenset(meld_shapes), frozenset(pair_shapes)
+
+SUIT_MELDS, SUIT_MELDS_PAIR = build_suit_tables()
+
+def is_valid_group(hand):
+    # Check if all tiles form valid sets (Pong / Chi), without a pair
+    for start in (0, 9, 18):
+        if bytes(hand[start:start + 9]) not in SUIT_MELDS:
+            return False
+    for count in hand[HONOR_START:]:
+        if count and count != 3:
+            return False
+    return True
+
+def is_winning_shape(hand):
+    # Each suit must be melds only or melds plus the (single) pair
+    has_pair = False
+    for start in (0, 9, 18):
+        suit = bytes(hand[start:start + 9])
+        remainder = sum(suit) % 3
+        if remainder == 0:
+            if suit not in SUIT_MELDS:
+                return False
+        elif remainder == 2 and not has_pair and suit in SUIT_MELDS_PAIR:
+            has_pair = True
+        else:
+            return False
 
-    elif tile.startswith("Flower") or tile.startswith("Season"):
-        try:
-            tile_num = int(tile[-1])
-            seat_wind = player.id
-            if tile_num == seat_wind:
-                player.tai += 1
-        except ValueError:
-            pass
+    # Honors can only form Pongs or the pair
+    for count in hand[HONOR_START:]:
+        if count == 2 and not has_pair:
+            has_pair = True
+        elif count and count != 3:
+            return False
 
-# Winning Logic
+    return has_pair
+
+# Decompositions
+# Every (pair, melds) split of a winning concealed hand is enumerated once per hand signature (kept
+# in a bounded LRU cache) and shared by scoring. Melds are (kind, tile, concealed) with kind "pong",
+# "gang" or "chi", where tile is the lowest tile of a Chi
+
+DECOMPOSITIONS = HandCache("decomposition")
+
+def enumerate_splits(hand):
+    counts = list(hand)
+    melds = []
+    splits = []
+
+    def search(first, pair):
+        while first < NUM_TILE_TYPES and counts[first] == 0:
+            first += 1
+        if first == NUM_TILE_TYPES:
+            if pair is not None:
+                splits.append((pair, tuple(melds)))
+            return
+        if counts[first] >= 3:
+            counts[first] -= 3
+            melds.append(("pong", first, True))
+            search(first, pair)
+            melds.pop()
+            counts[first] += 3
+        if pair is None and counts[first] >= 2:
+            counts[first] -= 2
+            search(first, first)
+            counts[first] += 2
+        if first < HONOR_START and first % 9 <= 6 and counts[first + 1] and counts[first + 2]:
+            for t in (first, first + 1, first + 2):
+                counts[t] -= 1
+            melds.append(("chi", first, True))
+            search(first, pair)
+            melds.pop()
+            for t in (first, first + 1, first + 2):
+                counts[t] += 1
+
+    search(0, None)
+    return tuple(splits)
+
+@cached_by_hand(DECOMPOSITIONS)
+def concealed_decompositions(hand):
+    # Splits of the concealed hand alone; shapes the suit tables reject are never searched
+    if not is_winning_shape(hand):
+        return ()
+    return enumerate_splits(hand)
+
+def exposed_melds(exposed_hand, concealed_gangs=()):
+    melds = []
+    for group in exposed_hand:
+        if len(group) == 4:
+            melds.append(("gang", group[0], group[0] in concealed_gangs))
+        elif group[0] == group[1]:
+            melds.append(("pong", group[0], False))
+        else:
+            melds.append(("chi", min(group), False))
+    return tuple(melds)
 
-def is_valid_group(tiles):
-    # Check if tiles from a valid set (to consider win)
-    if not tiles:
-        return True
-
-    tiles = sorted(tiles)
-    tile_counts = Counter(tiles)
-    first = tiles[0]
-
-    # Check for Pong
-
-    if tile_counts[first] >= 3:
-        remaining = tiles.copy()
-        for i in range(3):
-            remaining.remove(first)
-        if is_valid_group(remaining):
-            return True
-        
-    # Check for Chi
-
-    if len(first) == 2 and first[1] in ['B', 'C', 'D']:
-        try:
-            num = int(first[0])
-            suit = first[1]
-            second, third = f"{num+1}{suit}", f"{num+2}{suit}"
-            if second in tiles and third in tiles:
-                remaining = tiles.copy()
-                for t in [first, second, third]:
-                    remaining.remove(t)
-                if is_valid_group(remaining):
-                    return True
-        except ValueError:
-            pass
-
-    return False
+def decompositions(hand, exposed_hand, concealed_gangs=()):
+    # Every (pair, melds) split of hand + exposed_hand, or an empty list if the hand has not won
+    splits = concealed_decompositions(hand)
+    if not splits:
+        return []
+    exposed = exposed_melds(exposed_hand, concealed_gangs)
+    return [(pair, melds + exposed) for pair, melds in splits]
 
+@timed(RULE_LATENCY, "check_win", sample=CHECK_WIN_SAMPLE)
 def check_win(hand, exposed_hand):
     total_exposed = sum(len(group) for group in exposed_hand)
-    total_tiles = len(hand) + total_exposed
+    total_tiles = sum(hand) + total_exposed
 
     if total_tiles < 14:
         return False
 
-    tile_counts = Counter(hand)
-    pairs = []
-    for tile, count in tile_counts.items():
-        if count >= 2:
-            pairs.append(tile)
-
-    for pair in pairs:
-        temp_hand = hand.copy()
-        temp_hand.remove(pair)
-        temp_hand.remove(pair)
-        if is_valid_group(temp_hand):
-            return True
-
-    return False
-
-def check_win_discard(game, player, discarded_tile):
-    player_idx = player.id - 1
-    players = game.players
-    responders = players[player_idx + 1:] + players[:player_idx]
-
-    for responder in responders:
-        temp_hand = responder.hand.copy()
-        temp_hand.append(discarded_tile)
-        if check_win(temp_hand, responder.exposed_hand):
-            responder.hand.append(discarded_tile)
-            return responder
-    return None
+    # The suit tables answer without enumerating the splits that only scoring needs
+    return is_winning_shape(hand)
+
+# Waiting tiles (tenpai)
+# Hands are split into four groups (Bamboo, Characters, Dots, Honors). A tile only changes its own
+# group, so players cache each group's status and completing tiles and merge them into their waits
+
+GROUP_STARTS = (0, 9, 18, HONOR_START)
+GROUP_ENDS = (9, 18, HONOR_START, NUM_TILE_TYPES)
+
+def tile_group(tile):
+    return tile // 9 if tile < HONOR_START else 3
+
+def group_status(hand, group):
+    # 0 if the group is melds only, 1 if melds plus the pair, None if it can't be completed as is
+    if group < 3:
+        suit = bytes(hand[GROUP_STARTS[group]:GROUP_ENDS[group]])
+        remainder = sum(suit) % 3
+        if remainder == 0 and suit in SUIT_MELDS:
+            return 0
+        if remainder == 2 and suit in SUIT_MELDS_PAIR:
+            return 1
+        return None
+
+    pairs = 0
+    for count in hand[HONOR_START:]:
+        if count == 2:
+            pairs += 1
+        elif count and count != 3:
+            return None
+    return pairs if pairs <= 1 else None
+
+def group_waits(hand, group):
+    # Tiles of this group that would leave it complete, with whether the result holds the pair
+    waits = []
+    for tile in range(GROUP_STARTS[group], GROUP_ENDS[group]):
+        if hand[tile] < 4:
+            hand[tile] += 1
+            status = group_status(hand, group)
+            hand[tile] -= 1
+            if status is not None:
+                waits.append((tile, status))
+    return waits
+
+def collect_waits(statuses, waits_by_group):
+    # Merge cached per-group results: every other group must be complete and there must be one pair
+    incomplete = [group for group in range(4) if statuses[group] is None]
+    if len(incomplete) > 1:
+        return set()
+
+    pairs = sum(status for status in statuses if status is not None)
+    candidates = incomplete or range(4)
+    waits = set()
+    for group in candidates:
+        other_pairs = pairs - (statuses[group] or 0)
+        for tile, has_pair in waits_by_group[group]:
+            if other_pairs + has_pair == 1:
+                waits.add(tile)
+    return waits
+
+# Shanten (number of tiles away from a ready hand)
+# Each group's shape is broken into melds, partial sets (taatsu) and an optional pair. The best
+# block counts per shape are filled into these tables the first time a shape is seen, so a shanten
+# calculation is four table lookups plus a small merge. The tables are bounded LRU caches: a shape
+# evicted from them is worked out again from its (usually still cached) smaller shapes
+
+SUIT_BLOCKS = HandCache("suit_blocks")
+HONOR_BLOCKS = HandCache("honor_blocks")
+
+def merge_blocks(results, blocks, melds, partials, pair):
+    for (m, p), t in blocks.items():
+        if p + pair > 1:
+            continue
+        key = (m + melds, p + pair)
+        if results.get(key, -1) < t + partials:
+            results[key] = t + partials
+
+def group_blocks(shape, sequences=True):
+    # Best number of partial sets for every (melds, pair) split of a single group, as {(m, p): t}
+    table = SUIT_BLOCKS if sequences else HONOR_BLOCKS
+    blocks = table.get(shape)
+    if blocks is not MISSING:
+        return blocks
+
+    first = 0
+    while first < len(shape) and shape[first] == 0:
+        first += 1
+    if first == len(shape):
+        blocks = {(0, 0): 0}
+        table.put(shape, blocks)
+        return blocks
+
+    blocks = {}
+    counts = bytearray(shape)
+
+    def split(tiles, melds, partials, pair):
+        for i in tiles:
+            counts[i] -= 1
+        merge_blocks(blocks, group_blocks(bytes(counts), sequences), melds, partials, pair)
+        for i in tiles:
+            counts[i] += 1
+
+    split([first], 0, 0, 0) # Lowest tile left isolated
+    if counts[first] >= 3:
+        split([first] * 3, 1, 0, 0) # Pong
+    if counts[first] >= 2:
+        split([first] * 2, 0, 1, 0) # Pair waiting for Pong
+        split([first] * 2, 0, 0, 1) # Pair as the eyes
+    if sequences and first <= 6 and counts[first + 1] and counts[first + 2]:
+        split([first, first + 1, first + 2], 1, 0, 0) # Chi
+    if sequences and first <= 7 and counts[first + 1]:
+        split([first, first + 1], 0, 1, 0) # Two-sided / edge wait
+    if sequences and first <= 6 and counts[first + 2]:
+        split([first, first + 2], 0, 1, 0) # Closed wait
+
+    table.put(shape, blocks)
+    return blocks
+
+SHANTEN_CACHE = HandCache("shanten")
+
+@cached_by_hand(SHANTEN_CACHE)
+def calculate_shanten(hand):
+    # -1 means the hand has won, 0 means it is waiting on a tile. Exposed melds are implied by how
+    # many tiles are still concealed
+    needed = sum(hand) // 3
+    combos = {(0, 0): 0}
+    for group in range(4):
+        shape = bytes(hand[GROUP_STARTS[group]:GROUP_ENDS[group]])
+        merged = {}
+        for (m, p), t in group_blocks(shape, group < 3).items():
+            merge_blocks(merged, combos, m, t, p)
+        combos = merged
+
+    best = 2 * needed
+    for (m, p), t in combos.items():
+        m = min(m, needed)
+        shanten = 2 * (needed - m) - min(t, needed - m) - p
+        if shanten < best:
+            best = shanten
+    return best
 
 # Chi/Pong logic
 
 def can_pong(hand, tile):
-    return hand.count(tile) >= 2
+    return hand[tile] >= 2
 
 def resolve_pong(player, tile):
-    for i in range(2):
-        player.hand.remove(tile)
+    player.remove_tile(tile, 2)
     player.exposed_hand.append([tile] * 3)
-    print(f"{tile} added to exposed hand.")
+    logger.debug("%s added to exposed hand.", tile_name(tile))
 
 def find_valid_chis(hand, tile):
-    if len(tile) != 2 or tile[1] not in ['B', 'C', 'D']:
+    if not is_suited(tile):
         return []
 
-    try:
-        num = int(tile[0])
-        suit = tile[1]
-        options = [
-            [f"{num-2}{suit}", f"{num-1}{suit}"],
-            [f"{num-1}{suit}", f"{num+1}{suit}"],
-            [f"{num+1}{suit}", f"{num+2}{suit}"]
-        ]
-        # Find all Chi options where every tile in the group is present in the player's hand
-        valid_chi_options = []
-
-        for chi in options:
-            if all(tile in hand for tile in chi):
-                valid_chi_options.append(chi)
-        return valid_chi_options
-    except ValueError:
-        return []
+    rank = tile % 9
+    options = []
+    if rank >= 2:
+        options.append([tile - 2, tile - 1])
+    if 1 <= rank <= 7:
+        options.append([tile - 1, tile + 1])
+    if rank <= 6:
+        options.append([tile + 1, tile + 2])
+
+    # Find all Chi options where every tile in the group is present in the player's hand
+    valid_chi_options = []
+
+    for chi in options:
+        if hand[chi[0]] and hand[chi[1]]:
+            valid_chi_options.append(chi)
+    return valid_chi_options
 
 def can_chi(hand, tile):
     return bool(find_valid_chis(hand, tile))
@@ -138,94 +366,192 @@ def resolve_chi(player, tile):
 
     chi = chi_options[0]  
     for t in chi:
-        player.hand.remove(t)
+        player.remove_tile(t)
     group = chi + [tile]
     group.sort()
     player.exposed_hand.append(group)
-    print(f"{group} formed as Chi!")
+    logger.debug("%s formed as Chi!", tile_names(group))
 
 # To implement: Gang logic - consists of concealed, add-on or Pong-style gang, then drawing replacement tile
 
 def can_gang(hand, tile):
-    return hand.count(tile) == 3
+    return hand[tile] == 3
 
 def resolve_gang(game, player, tile):
-    for i in range(3):
-        player.hand.remove(tile)
+    player.remove_tile(tile, 3)
     player.exposed_hand.append([tile] * 4)
-    print(f"{tile} formed as Gang!")
+    logger.debug("%s formed as Gang!", tile_name(tile))
     draw_replacement_tile(game, player)
 
 def can_concealed_gang(hand):
     # Find all tiles in the hand that appear exactly 4 times
-    tiles_with_four_copies = []
-
-    tile_counts = Counter(hand)
-    for tile, count in tile_counts.items():
-        if count == 4:
-            tiles_with_four_copies.append(tile)
-    return tiles_with_four_copies  
+    return [tile for tile in range(NUM_TILE_TYPES) if hand[tile] == 4]
 
 def resolve_concealed_gang(game, player, tile):
-    for i in range(4):
-        player.hand.remove(tile)
+    player.remove_tile(tile, 4)
     player.exposed_hand.append([tile] * 4)
-    print(f"{tile} formed as (concealed) Gang!")
+    player.concealed_gangs.append(tile)
+    logger.debug("%s formed as (concealed) Gang!", tile_name(tile))
     draw_replacement_tile(game, player)
 
 def can_addon_gang(player):
     upgradeable = []
     for group in player.exposed_hand:
-        if len(group) == 3 and all(tile == group[0] for tile in group): # Check for Pong sets
-            if group[0] in player.hand:
+        if len(group) == 3 and group[0] == group[2]: # Check for Pong sets
+            if player.hand[group[0]]:
                 upgradeable.append(group[0])
     return upgradeable
 
 def resolve_addon_gang(game, player, tile):
-    player.hand.remove(tile)
+    player.remove_tile(tile)
     for group in player.exposed_hand:
-        if len(group) == 3 and group[0] == tile:
+        if len(group) == 3 and group[0] == tile and group[2] == tile:
             group.append(tile)
             break
-    print(f"{tile} upgraded to Gang!")
+    logger.debug("%s upgraded to Gang!", tile_name(tile))
     draw_replacement_tile(game, player)
 
 def draw_replacement_tile(game, player):
     if game.wall:
-        tile = game.wall.pop()
+        tile = game.wall.draw_replacement()
 
-        while tile.startswith("Flower") or tile.startswith("Season") or tile in ['Cat', 'Mouse', 'Chicken', 'Centipede']:
+        while is_bonus(tile):
             handle_bonus_tile(player, tile)
-            print(f"Player {player.id} draws bonus tile {tile}, replacing...")
-            tile = game.wall.pop()
-
-        print(f"Player {player.id} draws replacement tile {tile} after Gang")
+            logger.debug("Player %s draws bonus tile %s, replacing...", player.id, tile_name(tile))
+            game.log_event("bonus", player=player.id, tile=tile_name(tile))
+            if not game.wall:
+                return None
+            tile = game.wall.draw_replacement()
+
+        logger.debug("Player %s draws replacement tile %s after Gang", player.id, tile_name(tile))
+        game.log_event("replacement", player=player.id, tile=tile_name(tile))
         player.draw_tile(tile)
+        game.drew_tile = True # A win on the replacement tile counts as a self-draw
         return tile
     return None
 
-# To implement: Tai calculation
-
-def all_pong(hand, exposed_hand):
-    tile_count = Counter(hand)
-    triplet_count = 0
-    pair_count = 0
-
-    for tile, count in tile_count.items():
-        if count == 2:
-            pair_count += 1
-        elif count == 3:
-            triplet_count += 1
+# Tai calculation
+# Each decomposition of a winning hand is scored in a single pass over its melds, and the
+# best-scoring one is kept
+
+TAI_LIMIT = 5 # Limit hands, and any total past it, score the cap
+MIN_TAI = 1 # A winning shape can only be declared if it scores at least this
+EAST = HONOR_START
+WINDS = range(HONOR_START, HONOR_START + 4)
+DRAGONS = range(HONOR_START + 4, HONOR_START + 7)
+
+def score_hand(hand, pair, melds, bonus_tiles, seat, zimo, prevailing=EAST):
+    # Itemised Tai for a winning split as [(pattern, tai)], and the total capped at TAI_LIMIT
+    items = bonus_tai(bonus_tiles, seat)
+    seat_wind = HONOR_START + seat - 1
+
+    suits = set()
+    has_honors = pair >= HONOR_START
+    if not has_honors:
+        suits.add(pair // 9)
+    pongs = []
+    chis = 0
+    concealed = True
+    concealed_pongs = 0
+    terminals_only = not has_honors and pair % 9 in (0, 8)
+
+    for kind, tile, meld_concealed in melds:
+        if tile >= HONOR_START:
+            has_honors = True
+            terminals_only = False
         else:
-            return False
-        
-    for group in exposed_hand:
-        if len(group) == 3 and all(tile == group[0] for tile in group) or len(group) == 4 and all(tile == group[0] for tile in group):
-            triplet_count += 1
-
-    return triplet_count == 4 and pair_count == 1
-
-def calculate_tai(player):
-    if all_pong(player.hand, player.exposed_hand):
-        player.tai += 2
-    pass
\ No newline at end of file
+            suits.add(tile // 9)
+        if kind == "chi":
+            chis += 1
+            terminals_only = False
+        else:
+            pongs.append(tile)
+            if meld_concealed:
+                concealed_pongs += 1
+            if tile < HONOR_START and tile % 9 not in (0, 8):
+                terminals_only = False
+        if not meld_concealed:
+            concealed = False
+
+    dragon_pongs = [tile for tile in pongs if tile in DRAGONS]
+    wind_pongs = [tile for tile in pongs if tile in WINDS]
+
+    # Limit hands
+    limit = None
+    if len(dragon_pongs) == 3:
+        limit = "Big Three Dragons"
+    elif len(wind_pongs) == 4:
+        limit = "Big Four Winds"
+    elif len(wind_pongs) == 3 and pair in WINDS:
+        limit = "Small Four Winds"
+    elif not suits:
+        limit = "All Honours"
+    elif terminals_only:
+        limit = "All Terminals"
+    elif concealed_pongs == 4 and zimo: # On a discard win the last Pong may have been completed by the claim
+        limit = "Four Concealed Pongs"
+    elif concealed and len(suits) == 1 and not has_honors:
+        start = next(iter(suits)) * 9
+        shape = hand[start:start + 9]
+        if shape[0] >= 3 and shape[8] >= 3 and all(shape[1:8]):
+            limit = "Nine Gates"
+    if limit:
+        items.append((limit, TAI_LIMIT))
+        return items, TAI_LIMIT
+
+    for tile in dragon_pongs:
+        items.append((f"{tile_name(tile)} Dragon Pong", 1))
+    if seat_wind in wind_pongs:
+        items.append(("Seat Wind Pong", 1))
+    if prevailing in wind_pongs:
+        items.append(("Prevailing Wind Pong", 1))
+    if len(dragon_pongs) == 2 and pair in DRAGONS:
+        items.append(("Small Three Dragons", 4))
+
+    if len(pongs) == 4:
+        items.append(("All Pongs", 2))
+    elif chis == 4 and not bonus_tiles and pair not in DRAGONS and pair not in (seat_wind, prevailing):
+        items.append(("Pinghu", 4))
+
+    if len(suits) == 1:
+        items.append(("Half Flush", 2) if has_honors else ("Full Flush", 4))
+
+    if concealed:
+        items.append(("Concealed Hand", 1))
+    if zimo:
+        items.append(("Self-Draw", 1))
+
+    return items, min(sum(tai for name, tai in items), TAI_LIMIT)
+
+def best_score(hand, exposed_hand, concealed_gangs, bonus_tiles, seat, zimo, prevailing=EAST):
+    # (items, total) of the best-scoring split of a winning hand, or None if the hand has not won
+    best = None
+    for pair, melds in decompositions(hand, exposed_hand, concealed_gangs):
+        items, total = score_hand(hand, pair, melds, bonus_tiles, seat, zimo, prevailing)
+        if best is None or total > best[1]:
+            best = (items, total)
+    return best
+
+def can_win(player, tile=None, prevailing=EAST):
+    # Whether the player may declare a win: by self-draw on the hand as it stands, or by claiming
+    # the given discard. The hand must be a winning shape worth at least MIN_TAI
+    hand = player.hand
+    if tile is not None:
+        hand = hand.copy()
+        hand[tile] += 1
+    if not check_win(hand, player.exposed_hand):
+        return False
+    best = best_score(hand, player.exposed_hand, player.concealed_gangs, player.bonus_tiles, player.id,
+                      tile is None, prevailing)
+    return best is not None and best[1] >= MIN_TAI
+
+@timed(RULE_LATENCY, "calculate_tai")
+def calculate_tai(player, prevailing=EAST):
+    # Scores the player's winning hand, storing the total in player.tai and the items in player.tai_breakdown
+    best = best_score(player.hand, player.exposed_hand, player.concealed_gangs, player.bonus_tiles, player.id,
+                      player.zimo, prevailing)
+    if best is None:
+        items = bonus_tai(player.bonus_tiles, player.id)
+        best = (items, sum(tai for name, tai in items))
+    player.tai_breakdown, player.tai = best
+    return player.tai
@@ -0,0 +1,305 @@
+"""
+selfplay.py:
+
+Generates self-play training data for bot tuning. Bot-only games are played with each seat's
+policy wrapped in a recorder, which captures the visible state at every decision (discards, claims
+and gangs), and each decision is labelled with how the game ended for that seat.
+
+Data is written as shards: one directory per batch of games, holding one flat binary file per
+column plus meta.json with each column's dtype and shape. Rows are buffered and written in
+chunks of CHUNK_ROWS, and a shard only gets its final name once complete, so a crashed run never
+leaves a half-written shard behind and running it again only plays the missing shards. Writing only
+needs the standard library; reading (open_shard) memory-maps the columns with NumPy.
+
+Tables and columns (seat-indexed columns are rotated so row 0 is the deciding seat):
+    decisions: game, seat, kind (action code from actions.py), tile, taken, wall (tiles left),
+               hand (34), visible (34, in discards and melds), melds (4 x 34), discards (4 x 34),
+               result (1 the seat won, -1 it dealt in, 0 otherwise)
+    games:     seed, winner (player id, 0 for a draw), tai, zimo, dealt_in (player id, 0 if none),
+               first_decision, decisions
+
+Usage: python selfplay.py --games 10000 --out selfplay [--shard-games 1000] [--policy 1=lookahead]
+       python selfplay.py --read selfplay
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+from array import array
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from actions import ADDON_GANG, CHI, CONCEALED_GANG, DISCARD, GANG, PONG, WIN, iter_actions
+from game import Game
+from policies import DEFAULT_POLICY, BotPolicy, get_policy
+from simulate import add_policy_argument, quiet_logging
+from tiles import NUM_TILE_TYPES
+
+FORMAT_VERSION = 1
+CHUNK_ROWS = 4096 # Rows buffered per table before they are written out
+
+CLAIM_KINDS = {"win": WIN, "gang": GANG, "pong": PONG, "chi": CHI}
+GANG_KINDS = {"concealed": CONCEALED_GANG, "addon": ADDON_GANG}
+
+# (name, array typecode, shape of one row)
+TABLES = {
+    "decisions": [
+        ("game", "I", ()),
+        ("seat", "B", ()),
+        ("kind", "B", ()),
+        ("tile", "B", ()),
+        ("taken", "B", ()),
+        ("wall", "B", ()),
+        ("hand", "B", (NUM_TILE_TYPES,)),
+        ("visible", "B", (NUM_TILE_TYPES,)),
+        ("melds", "B", (4, NUM_TILE_TYPES)),
+        ("discards", "B", (4, NUM_TILE_TYPES)),
+        ("result", "b", ()),
+    ],
+    "games": [
+        ("seed", "Q", ()),
+        ("winner", "B", ()),
+        ("tai", "B", ()),
+        ("zimo", "B", ()),
+        ("dealt_in", "B", ()),
+        ("first_decision", "I", ()),
+        ("decisions", "I", ()),
+    ],
+}
+
+def numpy_dtype(typecode):
+    # NumPy dtype string for an array typecode, in this machine's byte order
+    item = array(typecode)
+    kind = "i" if typecode.islower() else "u"
+    return ("<" if sys.byteorder == "little" else ">") + kind + str(item.itemsize)
+
+class ShardWriter:
+    def __init__(self, path, chunk_rows=CHUNK_ROWS):
+        self.path = path
+        self.partial = path + ".partial"
+        self.chunk_rows = chunk_rows
+        if os.path.exists(self.partial):
+            shutil.rmtree(self.partial) # Left behind by a crashed run
+        os.makedirs(self.partial)
+        self.buffers = {table: {name: array(typecode) for name, typecode, shape in columns}
+                        for table, columns in TABLES.items()}
+        self.files = {table: {name: open(os.path.join(self.partial, f"{table}.{name}.bin"), "wb")
+                              for name, typecode, shape in columns}
+                      for table, columns in TABLES.items()}
+        self.rows = dict.fromkeys(TABLES, 0)
+        self.buffered = dict.fromkeys(TABLES, 0)
+
+    def append(self, table, row):
+        # row maps every column to an int, or to a flat sequence of ints for shaped columns
+        buffers = self.buffers[table]
+        for name, typecode, shape in TABLES[table]:
+            if shape:
+                buffers[name].extend(row[name])
+            else:
+                buffers[name].append(row[name])
+        self.rows[table] += 1
+        self.buffered[table] += 1
+        if self.buffered[table] >= self.chunk_rows:
+            self.flush(table)
+
+    def flush(self, table):
+        for name, buffer in self.buffers[table].items():
+            buffer.tofile(self.files[table][name])
+            del buffer[:]
+        self.buffered[table] = 0
+
+    def close(self):
+        for table in TABLES:
+            self.flush(table)
+            for file in self.files[table].values():
+                file.close()
+        meta = {
+            "version": FORMAT_VERSION,
+            "tables": {table: {
+                "rows": self.rows[table],
+                "columns": {name: {"dtype": numpy_dtype(typecode), "shape": list(shape)}
+                            for name, typecode, shape in columns},
+            } for table, columns in TABLES.items()},
+        }
+        with open(os.path.join(self.partial, "meta.json"), "w") as file:
+            json.dump(meta, file, indent=1)
+        os.replace(self.partial, self.path)
+
+def rotated(rows, seat):
+    # Seat-indexed rows starting from the given seat, flattened
+    return [value for offset in range(4) for value in rows[(seat + offset) % 4]]
+
+class Recorder:
+    # Collects one game's decisions, then labels them with the result once the game is over
+    def __init__(self, writer):
+        self.writer = writer
+        self.games = 0
+        self.decisions = 0
+        self.pending = []
+
+    def add(self, game, player, kind, tile, taken):
+        seat = player.id - 1
+        melds = [[0] * NUM_TILE_TYPES for other in game.players]
+        for other in game.players:
+            for meld in other.exposed_hand:
+                for meld_tile in meld:
+                    melds[other.id - 1][meld_tile] += 1
+        self.pending.append({
+            "game": self.games,
+            "seat": seat,
+            "kind": kind,
+            "tile": tile,
+            "taken": int(taken),
+            "wall": len(game.wall),
+            "hand": bytes(player.hand), # Copies, since the game keeps changing both
+            "visible": bytes(game.danger.visible),
+            "melds": rotated(melds, seat),
+            "discards": rotated(game.danger.discarded, seat),
+        })
+
+    def finish_game(self, game):
+        winner = game.winner
+        dealt_in = 0
+        if winner is not None and not winner.zimo:
+            dealt_in = next(player_id for code, player_id, tile in reversed(list(iter_actions(game.actions)))
+                            if code == DISCARD)
+        for row in self.pending:
+            player_id = row["seat"] + 1
+            row["result"] = 1 if winner is not None and winner.id == player_id else -1 if dealt_in == player_id else 0
+            self.writer.append("decisions", row)
+        self.writer.append("games", {
+            "seed": game.seed,
+            "winner": winner.id if winner else 0,
+            "tai": winner.tai if winner else 0,
+            "zimo": int(bool(winner and winner.zimo)),
+            "dealt_in": dealt_in,
+            "first_decision": self.decisions,
+            "decisions": len(self.pending),
+        })
+        self.games += 1
+        self.decisions += len(self.pending)
+        self.pending = []
+
+class RecordingPolicy(BotPolicy):
+    # Plays as the wrapped policy (and under its name) and records every decision it makes
+    def __init__(self, policy, recorder):
+        self.policy = policy
+        self.recorder = recorder
+        self.name = policy.name
+
+    def discard(self, game, player):
+        # Recorded before the tile leaves the hand
+        tile = self.policy.discard(game, player)
+        if tile is not None:
+            self.recorder.add(game, player, DISCARD, tile, True)
+        return tile
+
+    def claim(self, game, player, kind, tile, discarder_idx):
+        taken = self.policy.claim(game, player, kind, tile, discarder_idx)
+        self.recorder.add(game, player, CLAIM_KINDS[kind], tile, taken)
+        return taken
+
+    def gang(self, game, player, kind, tile):
+        taken = self.policy.gang(game, player, kind, tile)
+        self.recorder.add(game, player, GANG_KINDS[kind], tile, taken)
+        return taken
+
+def generate_shard(task):
+    # Plays one shard's games in a worker and writes them out. Returns (games, decisions)
+    path, seeds, policies = task
+    writer = ShardWriter(path)
+    recorder = Recorder(writer)
+    recording = {player_id: RecordingPolicy(get_policy(policies.get(player_id, DEFAULT_POLICY)), recorder)
+                 for player_id in range(1, 5)}
+
+    for seed in seeds:
+        game = Game(human_players=[], seed=seed, policies=recording)
+        game.play_bot_game()
+        recorder.finish_game(game)
+    writer.close()
+    return recorder.games, recorder.decisions
+
+def generate(directory, num_games, seed=0, shard_games=1000, processes=None, policies=None):
+    # Writes num_games seeded games to directory as shard-<first seed> shards. Shards that already
+    # exist are kept rather than played again, so an interrupted run can be resumed.
+    # Returns (games, decisions, shards skipped)
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(os.path.join(directory, f"shard-{first:012d}"), range(first, min(first + shard_games, seed + num_games)),
+              policies or {})
+             for first in range(seed, seed + num_games, shard_games)]
+    pending = [task for task in tasks if not os.path.exists(task[0])]
+    games = decisions = 0
+    with Pool(processes, initializer=quiet_logging) as pool:
+        for shard_games_written, shard_decisions in pool.imap_unordered(generate_shard, pending):
+            games += shard_games_written
+            decisions += shard_decisions
+    return games, decisions, len(tasks) - len(pending)
+
+# Reading
+
+def open_shard(path):
+    # {table: {column: read-only memory-mapped array of shape (rows, *shape)}} for one shard
+    if np is None:
+        raise ImportError("Reading self-play shards needs NumPy (pip install numpy)")
+    with open(os.path.join(path, "meta.json")) as file:
+        meta = json.load(file)
+    if meta["version"] != FORMAT_VERSION:
+        raise ValueError(f"Shard {path} has format version {meta['version']}, expected {FORMAT_VERSION}")
+
+    tables = {}
+    for table, info in meta["tables"].items():
+        tables[table] = {}
+        for name, column in info["columns"].items():
+            shape = (info["rows"], *column["shape"])
+            file_path = os.path.join(path, f"{table}.{name}.bin")
+            if info["rows"]:
+                tables[table][name] = np.memmap(file_path, dtype=column["dtype"], mode="r", shape=shape)
+            else:
+                tables[table][name] = np.zeros(shape, dtype=column["dtype"]) # Empty files can't be mapped
+    return tables
+
+def shard_paths(directory):
+    # Completed shards, in seed order
+    return sorted(path for path in glob.glob(os.path.join(directory, "shard-*")) if not path.endswith(".partial"))
+
+def iter_shards(directory):
+    for path in shard_paths(directory):
+        yield path, open_shard(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate or inspect self-play training data")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game; game i uses seed + i")
+    parser.add_argument("--out", default="selfplay", help="Directory to write shards to")
+    parser.add_argument("--shard-games", type=int, default=1000, help="Games per shard")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    add_policy_argument(parser)
+    parser.add_argument("--read", metavar="DIRECTORY", help="Summarise the shards in a directory instead")
+    args = parser.parse_args()
+
+    if args.read:
+        for path, tables in iter_shards(args.read):
+            games = tables["games"]
+            print(f"{os.path.basename(path)}: {len(games['seed'])} games, {len(tables['decisions']['seat'])} decisions, "
+                  f"{np.count_nonzero(games['winner']) / max(len(games['seed']), 1):.2%} won")
+        return
+
+    start = time.perf_counter()
+    games, decisions, skipped = generate(args.out, args.games, args.seed, args.shard_games, args.processes,
+                                         dict(args.policy))
+    seconds = time.perf_counter() - start
+    if skipped:
+        print(f"Kept {skipped} shard(s) already in {args.out}")
+    print(f"Wrote {games} games ({decisions} decisions) to {args.out} in {seconds:.1f}s "
+          f"({games / seconds:.1f} games/sec)")
+
+if __name__ == "__main__":
+    main()
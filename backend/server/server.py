@@ -1,442 +1,465 @@
+import logging
+import os
+import time
+from functools import wraps
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from flask_socketio import SocketIO
-from game import Game
-from rules import can_chi, can_pong , check_win, check_win_discard, calculate_tai      
+from flask_socketio import SocketIO, join_room, leave_room
+from claims import ClaimError
+from rooms import RoomRegistry, parse_num_humans
+from rules import can_win
+from logs import setup_logging
+from metrics import ACTIVE_SOCKETS, ROUTE_LATENCY, SERIALISE_LATENCY, render_metrics
+from store import open_store
+from tiles import hand_names, tile_id, tile_name, tile_names
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 cors = CORS(app, origins='*')
 socketio = SocketIO(app, cors_allowed_origins='*', async_mode='threading')
-desired_humans = None
-socket_to_player = {}
-next_human_slot = 0
-
-game = None 
+rooms = RoomRegistry(open_store())
+
+# Tiles are ints inside the engine; these helpers convert them to names at the JSON boundary
+def name_or_none(tile):
+    return tile_name(tile) if tile is not None else None
+
+def exposed_names(exposed_hand):
+    return [tile_names(group) for group in exposed_hand]
+
+def parse_tile(name):
+    return tile_id(name) if name is not None else None
+
+def with_room(handler):
+    # Looks up the room named in the query string / JSON body and holds its lock for the request
+    @wraps(handler)
+    def wrapper():
+        data = request.get_json(silent=True) or {}
+        room = rooms.get(request.args.get("room_id", data.get("room_id")))
+        if room is None:
+            return jsonify({"error": "Room not found"}), 404
+        with ROUTE_LATENCY.time(handler.__name__), room.lock: # Time spent waiting on the lock counts too
+            return handler(room, data)
+    return wrapper
 
 @socketio.on('connect')
 def handle_connect():
-    print("Client connected:", request.sid)   
+    logger.debug("Client connected: %s", request.sid)
+    ACTIVE_SOCKETS.inc()
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print("Client disconnected:", request.sid)
-    if request.sid in socket_to_player:
-        print(f"Player {socket_to_player[request.sid] + 1} disconnected")
-        del socket_to_player[request.sid]
+    logger.debug("Client disconnected: %s", request.sid)
+    ACTIVE_SOCKETS.dec()
+    room = rooms.leave(request.sid)
+    if room is not None:
+        logger.info("Socket %s left room %s", request.sid, room.id)
 
 @socketio.on('join-game')
 def handle_join_game(data):
-    print(f"joined game with data: {data}")                                      
-    global desired_humans, next_human_slot, game                                 
-
-    if request.sid in socket_to_player:
-        print(f"Player {socket_to_player[request.sid] + 1} is rejoining - resetting game")
-        game = None
-        desired_humans = None
-        next_human_slot = 0
-        socket_to_player.clear()
-        print("Game reset due to player rejoin!")
-
-    if desired_humans is not None and desired_humans != data.get('numHumans', 1):
-        print(f"Player count changed from {desired_humans} to {data.get('numHumans', 1)} - resetting game")
-        game = None
-        desired_humans = None
-        next_human_slot = 0
-        socket_to_player.clear()
-        print("Game reset due to player count change!")
-
-    if desired_humans is None:                                                   
-        desired_humans = data.get('numHumans', 1)                                
-        print(f"→ Desired human players: {desired_humans}")                       
-
-    slot = next_human_slot                                                        
-    socket_to_player[request.sid] = slot                                           
-    print(f"→ Assigned slot {slot} to SID {request.sid}")                          
-    next_human_slot += 1                                                           
-
-    if next_human_slot < desired_humans:                                           
-        print(f"Waiting for humans: {next_human_slot}/{desired_humans}")           
-        socketio.emit('player-assigned', {'player_id': slot + 1}, to=request.sid)
-        return                                                                     
-
-    human_players = list(range(1, desired_humans + 1))
-    game = Game(human_players=human_players)                                                                  
-    game.start_game()     
-    game.last_discarder = -1
-    game.winner = None
-    game.is_draw = False                                                         
-    print(f"All humans joined—started game with {desired_humans} human(s) and {4-desired_humans} bot(s)")  
-    for sid, player_slot in socket_to_player.items():
-        socketio.emit('player-assigned', {'player_id': player_slot + 1}, to=sid)
-    response = game_state()                                                        
-    payload = response.get_json()                                                  
-    socketio.emit('game-update', payload)
+    logger.debug("joined game with data: %s", data)
+    try:
+        num_humans = parse_num_humans(data.get('numHumans', 1))
+    except ValueError as error:
+        socketio.emit('join-error', {'error': str(error)}, to=request.sid)
+        return
+    # A player rejoining a room asks for the seat they had, so they get their own hand back
+    slot = None
+    if data.get('roomId') and data.get('playerId') is not None:
+        try:
+            slot = int(data['playerId']) - 1
+        except (TypeError, ValueError):
+            socketio.emit('join-error', {'error': f"Bad playerId {data['playerId']!r}"}, to=request.sid)
+            return
+
+    # A socket joining again leaves the room it was in before
+    previous_room = rooms.leave(request.sid)
+    if previous_room is not None:
+        leave_room(previous_room.id)
+        logger.info("Socket %s left room %s to rejoin", request.sid, previous_room.id)
+
+    room, slot = rooms.join(request.sid, num_humans, data.get('roomId'), slot)
+    if room is None:
+        socketio.emit('join-error', {'error': "Room not found, full or that seat is taken"}, to=request.sid)
+        return
+
+    join_room(room.id)
+    logger.info("Assigned slot %s in room %s to SID %s", slot, room.id, request.sid)
+
+    with room.lock:
+        if room.needed() > 0:
+            logger.info("Room %s waiting for humans: %s/%s", room.id, room.joined(), room.num_humans)
+            socketio.emit('player-assigned', {'player_id': slot + 1, 'room_id': room.id}, to=request.sid)
+            return
+
+        if room.restored:
+            room.restored = False
+            logger.info("Room %s: all humans rejoined—resuming game from version %s", room.id, room.game.version)
+            if room.game.claims is not None:
+                room.game.claims.start_timer(CLAIM_TIMEOUT)
+                watch_claims(room, room.game.claims)
+        else:
+            room.start_game()
+            logger.info("Room %s: all humans joined—started game with %s human(s) and %s bot(s)", room.id, num_humans, 4-num_humans)
+        for sid, player_slot in room.socket_to_player.items():
+            socketio.emit('player-assigned', {'player_id': player_slot + 1, 'room_id': room.id}, to=sid)
+        schedule_game(room)
+
+# Lobby
+@app.route("/api/rooms")
+def list_rooms():
+    with ROUTE_LATENCY.time("list_rooms"):
+        return jsonify({"rooms": rooms.list_rooms()})
+
+@app.route("/api/rooms", methods=["POST"])
+def create_room():
+    with ROUTE_LATENCY.time("create_room"):
+        data = request.get_json(silent=True) or {}
+        try:
+            room = rooms.create_room(data.get("numHumans", 1), data.get("botPolicy"))
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+        return jsonify({"room_id": room.id, "num_humans": room.num_humans, "bot_policy": room.bot_policy}), 201
+
+# Monitoring
+@app.route("/metrics")
+def metrics():
+    return render_metrics(), 200, {"Content-Type": "text/plain; version=0.0.4"}
 
 # Gamemode Page
-@app.route("/api/game_state")
-def game_state():
-    if game is None:
-        return jsonify({"waiting": True, "needed": desired_humans - next_human_slot}), 200
+# Game loop
+# Bot turns and draws run in a background task per room, which pushes every new state to the
+# room over 'game-update'. HTTP routes only apply the human's action and wake the loop up
+
+BOT_MOVE_DELAY = float(os.getenv("BOT_MOVE_DELAY", "1.0")) # Seconds between bot moves
+CLAIM_TIMEOUT = float(os.getenv("CLAIM_TIMEOUT", "20")) # Seconds humans get to answer a claim before they pass
+
+def publish_state(room):
+    # Pushes the room's new state (as a delta from the last published version) to its sockets
+    with room.lock:
+        update = room.publish(game_state_payload(room))
+    if update is not None:
+        socketio.emit('game-update', update, to=room.id)
+
+def schedule_game(room):
+    with room.lock:
+        room.needs_step = True
+        if room.loop_running:
+            return
+        room.loop_running = True
+    socketio.start_background_task(run_game_loop, room)
+
+def run_game_loop(room):
+    running = True
+    try:
+        while True:
+            with room.lock:
+                if room.game is None or not room.needs_step:
+                    room.loop_running = running = False # Cleared under the lock so schedule_game can't miss it
+                    return
+                room.needs_step = step_game(room.game)
+                window = room.game.claims
+                update = room.publish(game_state_payload(room))
+            if update is not None:
+                socketio.emit('game-update', update, to=room.id)
+            if window is not None:
+                watch_claims(room, window)
+            if room.needs_step:
+                socketio.sleep(BOT_MOVE_DELAY)
+    except Exception:
+        logger.exception("Game loop for room %s crashed", room.id)
+    finally:
+        # Lets the next action start a fresh loop instead of the room stalling for good
+        if running:
+            with room.lock:
+                room.loop_running = False
+
+def watch_claims(room, window):
+    # Starts the timer that passes for humans who haven't answered the claim window by its deadline
+    with room.lock:
+        if room.watched_claims is window:
+            return
+        room.watched_claims = window
+    socketio.start_background_task(expire_claims, room, window)
+
+def expire_claims(room, window):
+    socketio.sleep(max(0.0, window.deadline - time.monotonic()))
+    with room.lock:
+        game = room.game
+        if game is None or game.claims is not window:
+            return # Everyone answered in time
+        game.expire_claims()
+    publish_state(room)
+    schedule_game(room)
+
+def step_game(game):
+    # Plays the next automatic action (a human's draw or a whole bot turn).
+    # Returns True if another automatic action follows, False when waiting on a human or the game is over
     game.turn = game.turn % len(game.players)
 
-    if game.winner:
-        return jsonify({"winner": game.winner.id, "tai": game.winner.tai})
-    
-    if game.is_draw:
-        return jsonify({"draw": True})
+    if game.winner or game.is_draw:
+        return False
+
+    if game.claims is not None:
+        logger.debug("Game State: Waiting for human claims on %s", tile_name(game.claims.tile))
+        return False
+
+    if not game.wall and not game.just_ponged_chi:
+        game.declare_draw()
+        return False
 
-    if not game.wall and game.last_discard is None:
-        print("Wall exhausted — draw game.")
-        game.is_draw = True
-        return jsonify({"draw": True})
-    
     current_player = game.players[game.turn]
     current_player_id = current_player.id
-    
-    if current_player_id in game.human_players and game.has_drawn and game.last_discard is None:
-        if check_win(current_player.hand, current_player.exposed_hand):
-            calculate_tai(current_player)
-            game.winner = current_player
-            print(f"Player {current_player.id} wins by self-draw with {current_player.tai} Tai!")
-            return jsonify({"winner": current_player.id, "tai": current_player.tai})
-
-    # For debugging
-    print(f"Current Turn: {game.turn}")
-    for i, player in enumerate(game.players):
-        print(f"Player {i+1}'s hand: {player.hand}")
-        print(f"Player {i+1}'s bonus tiles: {player.bonus_tiles}")
-
-    discarded_tile = None
-    drawn_tile = None
-
-    # Handle drawing and discarding
+
     if current_player_id in game.human_players:
-        if game.wall and not game.has_drawn and game.last_discard is None and not getattr(game, 'just_ponged_chi', False):
-            drawn_tile = game.draw_tile()
-            game.has_drawn = True
-            print(f"Game State: Human player {current_player_id} drew {drawn_tile}")
-        else:
-            print(f"Game State: Human player {current_player_id} did not draw - has_drawn={game.has_drawn}, last_discard={game.last_discard}, just_ponged_chi={getattr(game, 'just_ponged_chi', False)}")
-    else:
-        # Bot player's turn
-        if game.last_discard is not None:
-            print(f"Game State: Bot {current_player_id} turn skipped - waiting for human Pong/Chi")
-            discarded_tile = None
-            drawn_tile = None
-        elif game.wall and not game.has_drawn:
-            drawn_tile = game.draw_tile()
-            game.has_drawn = True
-            
-            print(f"Bot drew tile: {drawn_tile}")
-            bot_idx = game.turn
-            discarded_tile = game.bot_discard()
-            print(f"Bot discarded tile: {discarded_tile}")
-            game.has_drawn = False
-
-            if discarded_tile is not None:
-                winner = check_win_discard(game, game.players[bot_idx], discarded_tile)
-                if winner:
-                    calculate_tai(winner)
-                    game.winner = winner
-                    print(f"Player {winner.id} wins by discard with {winner.tai} Tai!")
-                    return jsonify({"winner": winner.id, "tai": winner.tai})
-
-            can_any_human_pong = False
-            can_any_human_chi = False
-            
-            for human_id in game.human_players:
-                if human_id != bot_idx + 1:  
-                    human_idx = human_id - 1
-                    if can_pong(game.players[human_idx].hand, discarded_tile):
-                        can_any_human_pong = True
-                        break
-                        
-            next_player_idx = (bot_idx + 1) % len(game.players)
-            next_player_id = next_player_idx + 1
-            
-            print(f"Game State: Player {bot_idx+1} discarded {discarded_tile}")
-            print(f"Game State: Discarder idx: {bot_idx}, Next player idx: {next_player_idx}, Next player id: {next_player_id}")
-            print(f"Game State: Human players: {game.human_players}")
-            print(f"Game State: Next player is human: {next_player_id in game.human_players}")
-            
-            if next_player_id in game.human_players:
-                next_player_hand = game.players[next_player_idx].hand
-                print(f"Game State: Next player {next_player_id} hand: {next_player_hand}")
-                chi_possible = can_chi(next_player_hand, discarded_tile)
-                print(f"Game State: Can chi: {chi_possible}")
-                if chi_possible:
-                    can_any_human_chi = True
-                    print(f"Game State: Chi is possible for player {next_player_id}")
-                else:
-                    print(f"Game State: Chi not possible for player {next_player_id}")
-            else:
-                print(f"Game State: Next player {next_player_id} is not human, skipping Chi check")
-
-            print(f"Game State: Can any human pong: {can_any_human_pong}")
-            print(f"Game State: Can any human chi: {can_any_human_chi}")
-
-            if can_any_human_pong or can_any_human_chi:
-                game.last_discard = discarded_tile
-                game.last_discarder = bot_idx
-            else:
-                game.last_discard = None
-                game.last_discarder = -1
-                game.turn = (game.turn + 1) % 4
-        else:
-            discarded_tile = None
-            drawn_tile = None
+        if game.has_drawn or game.just_ponged_chi:
+            # A claimed Gang has already drawn its replacement tile, which can win like a bot's does
+            if game.just_ponged_chi and game.drew_tile and can_win(current_player):
+                game.declare_win(current_player)
+            return False
+
+        drawn_tile = game.draw_tile()
+        logger.debug("Game State: Human player %s drew %s", current_player_id, name_or_none(drawn_tile))
+        if drawn_tile is None: # Wall ran out while replacing bonus tiles
+            game.declare_draw()
+            return False
+        if can_win(current_player):
+            game.declare_win(current_player)
+        return False
+
+    # Bot player's turn (a bot that has just claimed a discard goes straight to discarding)
+    if not game.just_ponged_chi:
+        drawn_tile = game.draw_tile()
+        logger.debug("Bot drew tile: %s", name_or_none(drawn_tile))
+        if drawn_tile is None:
+            game.declare_draw()
+            return False
+    game.declare_bot_gangs(current_player) # As in Game.bot_game_steps, so live bots play like simulated ones
+    if game.drew_tile and can_win(current_player): # After a draw or a Gang's replacement tile, not a Pong or Chi
+        game.declare_win(current_player)
+        return False
+
+    bot_idx = game.turn
+    discarded_tile = game.bot_discard()
+    logger.debug("Bot discarded tile: %s", name_or_none(discarded_tile))
+    if discarded_tile is None:
+        game.has_drawn = False
+        game.turn = (game.turn + 1) % 4
+        return True
+
+    game.open_claims(bot_idx, discarded_tile, CLAIM_TIMEOUT)
+    return game.winner is None and game.claims is None
+
+# Gamemode Page
+@app.route("/api/game_state")
+@with_room
+def game_state(room, data):
+    # Read-only: the state only changes through actions and the room's game loop.
+    # Pass ?since=<version> to get only what changed after that version
+    if room.game is None:
+        return jsonify(game_state_payload(room))
+    since = request.args.get("since", type=int)
+    update = room.state_since(since)
+    if update is None:
+        # Nothing published yet: answer with the current state without recording a new version
+        update = {**game_state_payload(room), "version": room.game.version}
+    return jsonify(update)
+
+def game_state_payload(room):
+    with SERIALISE_LATENCY.time():
+        return build_game_state(room)
+
+def build_game_state(room):
+    game = room.game
+    if game is None:
+        return {"waiting": True, "needed": room.needed()}
+
+    if game.winner:
+        return {"winner": game.winner.id, "tai": game.winner.tai, "tai_breakdown": game.winner.tai_breakdown}
+    
+    if game.is_draw:
+        return {"draw": True}
 
     response = {
-        "current_turn": current_player_id - 1,
-        "discarded_tile": discarded_tile,
-        "drawn_tile": drawn_tile,
-        "discard_pile": game.discard_pile,  
+        "current_turn": game.turn,
+        "discarded_tile": name_or_none(game.last_discarded),
+        "drawn_tile": name_or_none(game.last_drawn),
+        "discard_pile": tile_names(game.discard_pile),  
         "players": []
     }
 
     for human_id in game.human_players:
         human_idx = human_id - 1
-        player_info = game.get_player_info(human_id)
+        human = game.players[human_idx]
         
         player_response = {
             "player_id": human_id,
-            "bonus": player_info["bonus_tiles"],
-            "exposed": player_info["exposed_hand"],
-            "hand": player_info["hand"],
-            "hand_count": len(player_info["hand"]),
+            "bonus": tile_names(human.bonus_tiles),
+            "exposed": exposed_names(human.exposed_hand),
+            "hand": hand_names(human.hand),
+            "hand_count": human.hand_size(),
+            "waits": tile_names(sorted(human.waits)),
             "possiblePong": [],
-            "possibleChi": []
+            "possibleChi": [],
+            "possibleGang": []
         }
         
-        if game.last_discard:
-            if can_pong(game.players[human_idx].hand, game.last_discard):
-                player_response["possiblePong"] = [game.get_pong_option(human_id)]
-            
-            discarder_idx = game.last_discarder
-            next_player_idx = (discarder_idx + 1) % len(game.players)
-            next_player_id = next_player_idx + 1
-            
-            print(f"Game State: Player {human_id}, discarder_idx: {discarder_idx}, next_player_idx: {next_player_idx}, next_player_id: {next_player_id}")
-            print(f"Game State: Is this player next? {human_id == next_player_id}")
-            print(f"Game State: Last discard: {game.last_discard}")
-            
-            if human_id == next_player_id:
-                print(f"Game State: Checking Chi for player {human_id}")
-                print(f"Game State: Player {human_id} hand: {game.players[human_idx].hand}")
-                chi_possible = can_chi(game.players[human_idx].hand, game.last_discard)
-                print(f"Game State: Can chi: {chi_possible}")
-                if chi_possible:
-                    chi_options = game.get_chi_options(human_id)
-                    print(f"Game State: Chi options: {chi_options}")
-                    player_response["possibleChi"] = chi_options
-                    print(f"Game State: Set possibleChi for player {human_id}: {chi_options}")
-                else:
-                    print(f"Game State: Chi not possible for player {human_id}")
-            else:
-                print(f"Game State: Player {human_id} is not next player, skipping Chi check")
+        window = game.claims # Claims the human still has to answer
+        if window is not None:
+            if window.can_claim(human_id, "pong"):
+                player_response["possiblePong"] = [tile_name(window.tile)]
+            if window.can_claim(human_id, "gang"):
+                player_response["possibleGang"] = [tile_name(window.tile)]
+            player_response["possibleChi"] = [tile_names(meld) for meld in game.get_chi_options(human_id)]
         
         response["players"].append(player_response)
 
     # Add info for all players (for display)
     all_players_info = []
     for p in game.players:
-        info = game.get_player_info(p.id)
         all_players_info.append({
             "id": p.id,
-            "bonus": info["bonus_tiles"],
-            "exposed": info["exposed_hand"],
-            "hand_count": len(info["hand"])
+            "bonus": tile_names(p.bonus_tiles),
+            "exposed": exposed_names(p.exposed_hand),
+            "hand_count": p.hand_size()
         })
     response["all_players"] = all_players_info
 
-    return jsonify(response)
+    return response
 
 @app.route("/api/discard_tile", methods=["POST"])
-def discard_tile():
-    data = request.get_json()
-    discarded_tile = data.get("tile")
+@with_room
+def discard_tile(room, data):
+    game = room.game
+    discarded_name = data.get("tile")
     player_id = data.get("player_id", 1)  
 
     if game is None:
         return jsonify({"error": "No game in progress"}), 400
 
+    try:
+        discarded_tile = parse_tile(discarded_name)
+    except KeyError:
+        return jsonify({"error": f"Unknown tile {discarded_name}"}), 400
+
     current_player = game.players[game.turn]
     current_player_id = current_player.id
     
-    if current_player_id == player_id and player_id in game.human_players:
-        print(f"Player {player_id} selected tile: {discarded_tile}")
-        print(f"Player {player_id}'s hand before discard: {game.players[player_id-1].hand}")
-        game.discard_tile(player_id, discarded_tile)
-        print(f"Player {player_id}'s hand after discard: {game.players[player_id-1].hand}")
-        game.players[player_id-1].hand = game.sort_tiles(game.players[player_id-1].hand)
-        game.has_drawn = False
-        game.just_ponged_chi = False  
-
-        if discarded_tile is not None:
-            winner = check_win_discard(game, game.players[player_id-1], discarded_tile)
-            if winner:
-                calculate_tai(winner)
-                game.winner = winner           
-                print(f"Player {winner.id} wins by discard with {winner.tai} Tai!")
-                return jsonify({"winner": winner.id, "tai": winner.tai})
-            
-        can_any_human_pong = False
-        can_any_human_chi = False
-        
-        for human_id in game.human_players:
-            if human_id != player_id:  
-                human_idx = human_id - 1
-                if can_pong(game.players[human_idx].hand, discarded_tile):
-                    can_any_human_pong = True
-                    break
-                    
-        discarder_idx = player_id - 1
-        next_player_idx = (discarder_idx + 1) % len(game.players)
-        next_player_id = next_player_idx + 1
-        
-        print(f"Discard Tile: Player {player_id} discarded {discarded_tile}")
-        print(f"Discard Tile: Discarder idx: {discarder_idx}, Next player idx: {next_player_idx}, Next player id: {next_player_id}")
-        print(f"Discard Tile: Human players: {game.human_players}")
-        print(f"Discard Tile: Next player is human: {next_player_id in game.human_players}")
-        
-        if next_player_id in game.human_players:
-            next_player_hand = game.players[next_player_idx].hand
-            print(f"Discard Tile: Next player {next_player_id} hand: {next_player_hand}")
-            chi_possible = can_chi(next_player_hand, discarded_tile)
-            print(f"Discard Tile: Can chi: {chi_possible}")
-            if chi_possible:
-                can_any_human_chi = True
-                print(f"Discard Tile: Chi is possible for player {next_player_id}")
-            else:
-                print(f"Discard Tile: Chi not possible for player {next_player_id}")
-        else:
-            print(f"Discard Tile: Next player {next_player_id} is not human, skipping Chi check")
-
-        print(f"Discard Tile: Can any human pong: {can_any_human_pong}")
-        print(f"Discard Tile: Can any human chi: {can_any_human_chi}")
-
-        if can_any_human_pong or can_any_human_chi:
-            game.last_discard = discarded_tile
-            game.last_discarder = discarder_idx
-            print(f"Discard Tile: Setting last_discard={discarded_tile}, last_discarder={discarder_idx}")
-            return jsonify({
-                "message": "Tile discarded, waiting for Chi/Pong",
-                "discarded_tile": discarded_tile,
-                "current_turn": game.turn
-            })
-        
-        game.last_discard = None
-        game.last_discarder = -1
-        game.turn = (game.turn + 1) % 4
-        print(f"Discard Tile: No Pong/Chi possible, advancing turn to {game.turn}")
+    if (current_player_id != player_id or player_id not in game.human_players
+            or discarded_tile is None or not current_player.hand[discarded_tile]):
+        return jsonify({"error": "Not your turn or tile not in hand"}), 400
+    if game.claims is not None:
+        return jsonify({"error": "Waiting for claims on the last discard"}), 400
+    if not (game.has_drawn or game.just_ponged_chi):
+        return jsonify({"error": "Not your turn to discard yet"}), 400
+
+    logger.debug("Player %s selected tile: %s", player_id, discarded_name)
+    game.discard_tile(player_id, discarded_tile)
+
+    window = game.open_claims(player_id - 1, discarded_tile, CLAIM_TIMEOUT)
+    publish_state(room)
+    schedule_game(room)
+    if window is not None:
+        watch_claims(room, window)
+
+    if game.winner:
+        return jsonify({"winner": game.winner.id, "tai": game.winner.tai, "tai_breakdown": game.winner.tai_breakdown})
+
+    if game.claims is not None:
         return jsonify({
-            "message": "Tile discarded, no Pong/Chi possible",
-            "discarded_tile": discarded_tile,
+            "message": "Tile discarded, waiting for Chi/Pong",
+            "discarded_tile": discarded_name,
             "current_turn": game.turn
         })
-
-    game.turn = (game.turn + 1) % 4
-
+    
+    logger.debug("Discard Tile: No Pong/Chi possible, advancing turn to %s", game.turn)
     return jsonify({
-        "message":        "Tile discarded",
-        "discarded_tile": discarded_tile,
-        "current_turn":   game.players[game.turn].id - 1
+        "message": "Tile discarded, no Pong/Chi possible",
+        "discarded_tile": discarded_name,
+        "current_turn": game.turn
     })
 
 @app.route("/api/pong", methods=["POST"])
-def pong():
-    data = request.get_json()
-    tile = data["tile"]
-    player_id = data.get("player_id", 1)  
-    
-    print(f"Player {player_id} chose Pong for tile: {tile}")
+@with_room
+def pong(room, data):
+    return claim_response(room, data, "pong")
 
-    from rules import resolve_pong
-    resolve_pong(game.players[player_id-1], tile)
-    print(f"Resolved Pong for: {tile}")
+@app.route("/api/gang", methods=["POST"])
+@with_room
+def gang(room, data):
+    return claim_response(room, data, "gang")
 
-    game.remove_from_discard_pile(tile)
+@app.route("/api/chi", methods=["POST"])
+@with_room
+def chi(room, data):
+    return claim_response(room, data, "chi")
+
+def claim_response(room, data, kind):
+    # Records a human's claim on the open discard. It is applied once the claim window resolves,
+    # which is straight away unless a seat that could outrank it hasn't answered yet
+    game = room.game
+    if game is None:
+        return jsonify({"error": "No game in progress"}), 400
+    player_id = data.get("player_id", 1)
+    logger.debug("Player %s chose %s (%s)", player_id, kind, data.get("tiles", data.get("tile")))
 
-    game.last_discard = None
-    game.last_discarder = -1
-    game.has_drawn = False  
-    game.turn = player_id - 1  
-    game.just_ponged_chi = True  
+    try:
+        game.respond_claim(player_id, kind)
+    except ClaimError as error:
+        return jsonify({"error": str(error)}), 400
+    publish_state(room)
+    schedule_game(room)
 
     info = game.get_player_info(player_id)
     return jsonify({
-        "hand":         info["hand"],
-        "exposed":      info["exposed_hand"],
+        "hand":         tile_names(info["hand"]),
+        "exposed":      exposed_names(info["exposed_hand"]),
         "current_turn": game.turn
     })
 
 @app.route("/api/pass_pong", methods=["POST"])
-def pass_pong():
-    data = request.get_json()
-    player_id = data.get("player_id", 1)     
-    game.pass_pong()
-    game.last_discard = None
-    game.last_discarder = -1
-    game.turn = (game.turn + 1) % 4
-    game.has_drawn = False
-    return jsonify({"message": "Pong passed"})
-
-@app.route("/api/chi", methods=["POST"])
-def chi():
-    data = request.get_json()
-    tiles = data.get("tiles") 
-    player_id = data.get("player_id", 1)  
-    print(f"Player {player_id} chose Chi for tiles: {tiles}")
-    from rules import resolve_chi
-    resolve_chi(game.players[player_id-1], game.last_discard)
-    print(f"Resolved Chi with discard: {game.last_discard}")
-    game.remove_from_discard_pile(game.last_discard)
-    game.last_discard = None
-    game.last_discarder = -1
-    game.turn = player_id - 1  
-    game.has_drawn = False  
-    game.just_ponged_chi = True  
-    info = game.get_player_info(player_id)
-    return jsonify({
-        "hand":         info.get("hand", []),
-        "exposed":      info.get("exposed_hand", []),
-        "current_turn": game.turn
-    })
+@with_room
+def pass_pong(room, data):
+    return pass_response(room, data, "Pong")
 
 @app.route("/api/pass_chi", methods=["POST"])
-def pass_chi():
-    data = request.get_json()
-    player_id = data.get("player_id", 1)     
-    game.pass_chi()
-    game.last_discard = None
-    game.last_discarder = -1
-    game.turn = (game.turn + 1) % 4   
-    game.has_drawn = False   
-    return jsonify({"message": "Chi passed"})
+@with_room
+def pass_chi(room, data):
+    return pass_response(room, data, "Chi")
+
+def pass_response(room, data, claim):
+    game = room.game
+    if game is None:
+        return jsonify({"error": "No game in progress"}), 400
+    player_id = data.get("player_id", 1)
+    if game.claims is None:
+        return jsonify({"error": "No claim in progress"}), 400
+    try:
+        if claim == "Chi":
+            game.pass_chi(player_id)
+        else:
+            game.pass_pong(player_id)
+    except ClaimError as error:
+        return jsonify({"error": str(error)}), 400
+    publish_state(room)
+    schedule_game(room)
+    return jsonify({"message": f"{claim} passed"})
 
 @app.route("/api/reset", methods=["POST"])
-def reset():
-    global game, desired_humans, next_human_slot, socket_to_player
-    game = None
-    desired_humans = None
-    next_human_slot = 0
-    socket_to_player.clear()
-    print("Game reset!")
+@with_room
+def reset(room, data):
+    rooms.remove_room(room.id)
+    logger.info("Room %s reset!", room.id)
     return jsonify({"message": "Game reset"}), 200
 
 @app.route("/api/rejoin", methods=["POST"])
-def rejoin():
-    global game, desired_humans, next_human_slot, socket_to_player
-    print("Player rejoin detected - resetting game state")
-    game = None
-    desired_humans = None
-    next_human_slot = 0
-    socket_to_player.clear()
-    print("Game reset due to player rejoin!")
+@with_room
+def rejoin(room, data):
+    logger.info("Player rejoin detected - closing room %s", room.id)
+    rooms.remove_room(room.id)
     return jsonify({"message": "Game reset for rejoin"}), 200
 
-import os
-
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 5000))
     debug = os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true", "yes")
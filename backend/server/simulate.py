@@ -0,0 +1,113 @@
+"""
+simulate.py:
+
+Plays headless 4-bot games (no output or input) across a process pool, for balancing and
+regression checks on rule and bot changes. Each game is seeded from the base seed, so any
+game in a run can be replayed on its own with Game(human_players=[], seed=...).
+
+Seats default to the basic bot; --policy gives seats other bot policies (see policies.py), and
+--batch plays that many games per worker in lockstep so policies decide their discards in batches.
+
+Usage: python simulate.py --games 100000 --seed 0 --processes 8 [--policy 1=lookahead] [--batch 256]
+"""
+
+import argparse
+import logging
+import time
+from collections import Counter
+from functools import partial
+from multiprocessing import Pool
+
+from game import Game
+from policies import get_policy, play_bot_games
+
+def seat_policy(option):
+    # A --policy SEAT=NAME option as (player id, policy name)
+    seat, _, name = option.partition("=")
+    if seat not in ("1", "2", "3", "4"):
+        raise argparse.ArgumentTypeError(f"expected SEAT=NAME with a seat from 1 to 4, got {option!r}")
+    try:
+        get_policy(name)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
+    return int(seat), name
+
+def add_policy_argument(parser):
+    # --policy as shared by the command-line tools; args.policy is a list of (player id, name)
+    parser.add_argument("--policy", action="append", default=[], type=seat_policy, metavar="SEAT=NAME",
+                        help="Bot policy for a seat (1-4), e.g. 1=lookahead; repeat for more seats")
+
+def game_result(winner):
+    if winner is None:
+        return None, 0, False
+    return winner.id, winner.tai, winner.zimo
+
+def play_game(seed, policies=None):
+    game = Game(human_players=[], seed=seed, policies=policies)
+    return [game_result(game.play_bot_game())]
+
+def play_games(seeds, policies=None):
+    # A batch of games played in lockstep (see policies.play_bot_games)
+    games = [Game(human_players=[], seed=seed, policies=policies) for seed in seeds]
+    return [game_result(winner) for winner in play_bot_games(games)]
+
+def quiet_logging():
+    # Only warnings and errors from the workers
+    logging.getLogger().setLevel(logging.WARNING)
+
+def run_simulation(num_games, seed=0, processes=None, chunksize=64, policies=None, batch=1):
+    stats = {
+        "games": 0,
+        "draws": 0,
+        "self_draws": 0,
+        "wins_by_seat": Counter(),
+        "tai": Counter(),
+    }
+
+    start = time.perf_counter()
+    with Pool(processes, initializer=quiet_logging) as pool:
+        seeds = range(seed, seed + num_games)
+        if batch > 1:
+            tasks = [seeds[i:i + batch] for i in range(0, num_games, batch)]
+            results = pool.imap_unordered(partial(play_games, policies=policies), tasks)
+        else:
+            results = pool.imap_unordered(partial(play_game, policies=policies), seeds, chunksize)
+        for winner_id, tai, zimo in (result for batch_results in results for result in batch_results):
+            stats["games"] += 1
+            if winner_id is None:
+                stats["draws"] += 1
+                continue
+            stats["wins_by_seat"][winner_id] += 1
+            stats["tai"][tai] += 1
+            if zimo:
+                stats["self_draws"] += 1
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def print_report(stats):
+    games = stats["games"]
+    wins = games - stats["draws"]
+    print(f"Games: {games} in {stats['seconds']:.1f}s ({games / stats['seconds']:.1f} games/sec)")
+    print(f"Draw rate: {stats['draws'] / games:.2%}")
+    print(f"Self-draw wins: {stats['self_draws'] / max(wins, 1):.2%} of wins")
+    for seat in range(1, 5):
+        print(f"Seat {seat} win rate: {stats['wins_by_seat'][seat] / games:.2%}")
+    print("Tai distribution:")
+    for tai, count in sorted(stats["tai"].items()):
+        print(f"  {tai} Tai: {count} ({count / max(wins, 1):.2%})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run headless bot-vs-bot Mahjong games")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first game; game i uses seed + i")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=64)
+    add_policy_argument(parser)
+    parser.add_argument("--batch", type=int, default=1, help="Games per worker played in lockstep with batched discards")
+    args = parser.parse_args()
+
+    stats = run_simulation(args.games, args.seed, args.processes, args.chunksize, dict(args.policy), args.batch)
+    print_report(stats)
+
+if __name__ == "__main__":
+    main()
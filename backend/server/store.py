@@ -0,0 +1,125 @@
+"""
+store.py:
+
+Checkpoints each room's game to SQLite so in-progress tables survive a worker restart. Rooms queue
+their latest Game.snapshot() after every published state, and a background thread writes whatever
+is queued in one transaction every FLUSH_INTERVAL seconds, so requests never wait on the disk.
+Rooms are read back lazily the first time they are asked for after a restart.
+
+Set GAME_STORE to the SQLite file to enable it (e.g. GAME_STORE=games.db).
+"""
+
+import atexit
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from game import Game
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("GAME_STORE_FLUSH_INTERVAL", "0.5")) # Seconds between batched writes
+
+FLUSH_LATENCY = Histogram("mahjong_checkpoint_flush_seconds", "Time spent writing a batch of checkpoints")
+
+DELETED = object()
+
+class GameStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL") # Crash-safe without blocking readers
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS games ("
+            "room_id TEXT PRIMARY KEY, num_humans INTEGER, version INTEGER, state BLOB, updated REAL)"
+        )
+        self.connection.commit()
+        self.db_lock = threading.Lock()
+        self.pending = {} # Room id -> (num_humans, version, snapshot), or DELETED
+        self.pending_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = False
+        self.writer = threading.Thread(target=self.run, name="game-store", daemon=True)
+        self.writer.start()
+
+    def save(self, room_id, num_humans, version, snapshot):
+        # Queues the room's latest snapshot; a newer one replaces it if the batch hasn't been written yet
+        with self.pending_lock:
+            self.pending[room_id] = (num_humans, version, snapshot)
+
+    def delete(self, room_id):
+        with self.pending_lock:
+            self.pending[room_id] = DELETED
+
+    def load(self, room_id):
+        # (num_humans, Game) for a checkpointed room, or None
+        with self.pending_lock:
+            entry = self.pending.get(room_id)
+        if entry is DELETED:
+            return None
+        if entry is not None:
+            num_humans, version, snapshot = entry
+            return num_humans, Game.from_snapshot(snapshot)
+
+        with self.db_lock:
+            row = self.connection.execute(
+                "SELECT num_humans, state FROM games WHERE room_id = ?", (room_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        num_humans, state = row
+        return num_humans, Game.from_snapshot(pickle.loads(state))
+
+    def flush(self):
+        with self.pending_lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return
+
+        saves = []
+        deletes = []
+        now = time.time()
+        for room_id, entry in batch.items():
+            if entry is DELETED:
+                deletes.append((room_id,))
+            else:
+                num_humans, version, snapshot = entry
+                state = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+                saves.append((room_id, num_humans, version, state, now))
+
+        with FLUSH_LATENCY.time(), self.db_lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?)", saves)
+            self.connection.executemany("DELETE FROM games WHERE room_id = ?", deletes)
+        logger.debug("Checkpointed %s room(s), removed %s", len(saves), len(deletes))
+
+    def run(self):
+        while not self.closed:
+            self.wake.wait(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Checkpoint write failed")
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.writer.join()
+        self.flush()
+        with self.db_lock:
+            self.connection.close()
+
+def open_store(path=None):
+    # The store configured by GAME_STORE, or None when persistence is off
+    path = path or os.getenv("GAME_STORE")
+    if not path:
+        return None
+    store = GameStore(path)
+    atexit.register(store.close)
+    logger.info("Checkpointing games to %s", path)
+    return store
@@ -2,64 +2,95 @@
 tiles.py:
 
 Handles tile logic (initial dealing of tiles, sorting tiles and replacing tiles)
+
+Tiles are encoded as small ints so the game engine never has to parse strings:
+    0-8   -> 1B-9B (Bamboo)
+    9-17  -> 1C-9C (Characters)
+    18-26 -> 1D-9D (Dots)
+    27-33 -> East, South, West, North, Red, Green, White
+    34-45 -> Flower1-4, Season1-4, Cat, Mouse, Chicken, Centipede (bonus tiles)
+Hands are count vectors of length NUM_TILE_TYPES (one slot per non-bonus tile).
+Names are only used at the JSON boundary (see tile_name / tile_id).
 """
 
+SUITS = ['B', 'C', 'D'] # Bamboo, Characters, Dots
+HONORS = ['East', 'South', 'West', 'North', 'Red', 'Green', 'White']
+FLOWERS = [f"Flower{i}" for i in range(1, 5)]
+SEASONS = [f"Season{i}" for i in range(1, 5)]
+ANIMALS = ["Cat", "Mouse", "Chicken", "Centipede"]
+
+HONOR_START = 27
+NUM_TILE_TYPES = 34 # Suited + honor tiles (the slots of a hand count vector)
+BONUS_START = 34
+FLOWER_START = 34
+SEASON_START = 38
+ANIMAL_START = 42
+NUM_TILE_IDS = 46
+
+TILE_NAMES = ([f"{number}{suit}" for suit in SUITS for number in range(1, 10)]
+              + HONORS + FLOWERS + SEASONS + ANIMALS)
+TILE_IDS = {name: tile for tile, name in enumerate(TILE_NAMES)}
+
+# Tile codec
+
+def tile_id(name):
+    return TILE_IDS[name]
+
+def tile_name(tile):
+    return TILE_NAMES[tile]
+
+def tile_names(tiles):
+    return [TILE_NAMES[tile] for tile in tiles]
+
+def is_bonus(tile):
+    return tile >= BONUS_START
+
+def is_suited(tile):
+    return tile < HONOR_START
+
+def hand_from_tiles(tiles):
+    # Build a count vector from a list of tile ids
+    counts = [0] * NUM_TILE_TYPES
+    for tile in tiles:
+        counts[tile] += 1
+    return counts
+
+# Runs of 0-4 copies of each tile (as ids and as names), so expanding a hand is one extend per tile
+TILE_RUNS = [[[tile] * count for count in range(5)] for tile in range(NUM_TILE_TYPES)]
+NAME_RUNS = [[[TILE_NAMES[tile]] * count for count in range(5)] for tile in range(NUM_TILE_TYPES)]
+
+def tiles_from_hand(counts):
+    # Expand a count vector back into a sorted list of tile ids
+    tiles = []
+    for tile, count in enumerate(counts):
+        if count:
+            tiles.extend(TILE_RUNS[tile][count])
+    return tiles
+
+def hand_names(counts):
+    # Sorted tile names of a count vector, without building the id list first
+    names = []
+    for tile, count in enumerate(counts):
+        if count:
+            names.extend(NAME_RUNS[tile][count])
+    return names
+
 # Tiles to generate: suited tiles, honor tiles and bonus tiles
 def generate_suited_tiles():
-    suits = ['B', 'C', 'D'] # Bamboo, Characters, Dots
     tiles = []
-    for suit in suits:
-        for number in range(1, 10):
-            tiles.extend([f"{number}{suit}"] * 4) # Generates 4 sets of suited tiles from 1 to 9
+    for tile in range(HONOR_START):
+        tiles.extend([tile] * 4) # Generates 4 sets of suited tiles from 1 to 9
     return tiles
 
 def generate_honor_tiles():
-    honors = ['East', 'South', 'West', 'North', 'Red', 'Green', 'White']
     tiles = []
-    for honor in honors:
-        tiles.extend([honor] * 4) # Generates 4 of each honor tile
+    for tile in range(HONOR_START, NUM_TILE_TYPES):
+        tiles.extend([tile] * 4) # Generates 4 of each honor tile
     return tiles
 
 def generate_bonus_tiles():
-    flowers = [f"Flower{i}" for i in range(1, 5)] # Generates Flower tiles from 1 to 4
-    seasons = [f"Season{i}" for i in range(1, 5)] # Generates Season tiles from 1 to 4
-    animals = ["Cat", "Mouse", "Chicken", "Centipede"]
-    return flowers + seasons + animals
+    return list(range(BONUS_START, NUM_TILE_IDS)) # Flowers, Seasons and Animals (one of each)
 
 def generate_full_wall():
     wall = generate_suited_tiles() + generate_honor_tiles() + generate_bonus_tiles()
     return wall # Add and return everything (unsorted)
-
-# def get_tile_number(tile):
-#     try:
-#         return int(tile[0])
-#     except ValueError:
-#         return 0
-
-# def sort_numeric_tiles(tiles):
-#     tiles.sort(key = get_tile_number)
-
-# def sort_tiles(hand):
-#     # Sort in order of: B, C, D, Honors
-#     bamboos = []
-#     characters = []
-#     dots = []
-#     honors = []
-
-#     for tile in hand:
-#         if len(tile) == 2 and tile[1] == 'B':
-#             bamboos.append(tile)
-#         elif len(tile) == 2 and tile[1] == 'C':
-#             characters.append(tile)
-#         elif len(tile) == 2 and tile[1] == 'D':
-#             dots.append(tile)
-#         else:
-#             honors.append(tile) 
-
-#     # Sort each category
-#     sort_numeric_tiles(bamboos)
-#     sort_numeric_tiles(characters)
-#     sort_numeric_tiles(dots)
-#     honors.sort() # Alphabetical order
-
-#     return bamboos + characters + dots + honors
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+wall.py:
+
+Handles the wall as a compact array of tile ids. Normal draws take from the front through a cursor,
+and Gang / bonus replacements take from the dead-wall end at the back, so no draw moves or copies
+tiles.
+"""
+
+from array import array
+
+from tiles import generate_full_wall
+
+FULL_WALL = array("b", generate_full_wall()) # Unshuffled wall, copied for every game
+
+class Wall:
+    __slots__ = ("tiles", "front", "back")
+
+    def __init__(self, rng=None):
+        self.tiles = array("b", FULL_WALL)
+        if rng is not None:
+            rng.shuffle(self.tiles)
+        self.front = 0 # Next tile for a normal draw
+        self.back = len(self.tiles) # Tiles from here on have been drawn as replacements
+
+    def __len__(self):
+        return self.back - self.front
+
+    def draw(self):
+        tile = self.tiles[self.front]
+        self.front += 1
+        return tile
+
+    def draw_replacement(self):
+        self.back -= 1
+        return self.tiles[self.back]
+
+    def clone(self):
+        other = Wall.__new__(Wall)
+        other.tiles = array("b", self.tiles)
+        other.front = self.front
+        other.back = self.back
+        return other
+
+    def snapshot(self):
+        return bytes(self.tiles), self.front, self.back
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        tiles, front, back = snapshot
+        wall = cls.__new__(cls)
+        wall.tiles = array("b", tiles)
+        wall.front = front
+        wall.back = back
+        return wall
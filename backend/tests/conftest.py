@@ -0,0 +1,45 @@
+"""
+conftest.py:
+
+Puts the server modules on the import path and keeps tests away from the checkpoint store. Shared
+fixtures set up claim windows from hands given tile by tile rather than by playing a seeded game,
+so each test keeps covering the same situation as the rules change.
+"""
+
+import logging
+import os
+import sys
+
+os.environ["GAME_STORE"] = "" # Tests never touch the checkpoint store
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "server"))
+
+import pytest
+
+from game import Game
+from tiles import hand_from_tiles, tile_id
+
+# 13 tiles of honour pairs that take no part in any claim on a suited discard
+FILLER = ["East", "East", "South", "South", "West", "West", "North", "North", "Red", "Red", "Green", "Green", "White"]
+
+logging.disable(logging.INFO)
+
+def tiles(names):
+    return [tile_id(name) for name in names]
+
+def setup_game(human_players, hands):
+    # A dealt game with every player's concealed hand replaced
+    game = Game(human_players=human_players, seed=1)
+    game.deal_tiles()
+    for player, names in zip(game.players, hands):
+        player.hand = hand_from_tiles(tiles(names))
+        player.refresh_waits()
+    game.turn = 0
+    return game
+
+@pytest.fixture
+def chi_and_pong():
+    # Humans 1, 2 and 4 after player 1 discards 3B, which player 2 can Chi (1B 2B) and player 4 can Pong
+    game = setup_game([1, 2, 4], [["3B"] + FILLER[:12], ["1B", "2B"] + FILLER[:11], FILLER,
+                                  ["3B", "3B"] + FILLER[:11]])
+    game.discard_tile(1, tile_id("3B"))
+    return game
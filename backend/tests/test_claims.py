@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import server
+from claims import ClaimError
+from conftest import FILLER, setup_game, tiles
+from game import Game
+from rooms import RoomRegistry
+from tiles import hand_from_tiles, tile_id
+
+def test_bot_pong_beats_pending_chi():
+    # A bot's Pong outranks any Chi, so the window resolves without waiting on the human
+    game = setup_game([1, 2], [["3B"] + FILLER[:12], ["1B", "2B"] + FILLER[:11], ["3B", "3B"] + FILLER[:11], FILLER])
+    game.discard_tile(1, tile_id("3B"))
+    assert game.open_claims(0, tile_id("3B"), 5) is None
+    assert game.turn == 2
+    assert game.players[2].exposed_hand == [tiles(["3B"] * 3)]
+
+def test_chi_waits_for_pong(chi_and_pong):
+    game = chi_and_pong
+    window = game.open_claims(0, tile_id("3B"), 5)
+    assert window.options == {2: ["chi"], 4: ["pong"]}
+    game.respond_claim(2, "chi")
+    assert game.claims is window # The Pong seat hasn't answered yet
+    game.pass_pong(4)
+    assert game.claims is None and game.turn == 1 and game.just_ponged_chi
+    assert game.players[1].exposed_hand == [tiles(["1B", "2B", "3B"])]
+
+def test_pong_beats_earlier_chi(chi_and_pong):
+    game = chi_and_pong
+    game.open_claims(0, tile_id("3B"), 5)
+    game.respond_claim(4, "pong")
+    assert game.claims is None and game.turn == 3
+    assert game.players[3].exposed_hand == [tiles(["3B"] * 3)]
+
+@pytest.mark.parametrize("player_id, kind", [(3, "pong"), (2, "pong"), (4, "chi")])
+def test_illegal_claims(chi_and_pong, player_id, kind):
+    chi_and_pong.open_claims(0, tile_id("3B"), 5)
+    with pytest.raises(ClaimError):
+        chi_and_pong.respond_claim(player_id, kind)
+
+def test_restore(chi_and_pong):
+    game = chi_and_pong
+    game.open_claims(0, tile_id("3B"), 5)
+    game.respond_claim(2, "chi")
+    restored = Game.from_snapshot(game.snapshot())
+    assert restored.claims.options == game.claims.options
+    assert restored.claims.responses == {2: "chi"}
+    restored.pass_pong(4)
+    assert restored.claims is None
+    assert restored.players[1].exposed_hand == [tiles(["1B", "2B", "3B"])]
+
+def test_timeout(chi_and_pong):
+    game = chi_and_pong
+    window = game.open_claims(0, tile_id("3B"), 0.05)
+    game.expire_claims()
+    assert game.claims is window # Not expired before its deadline
+    time.sleep(0.06)
+    game.expire_claims()
+    assert game.claims is None and game.turn == 1 and not game.players[1].exposed_hand
+
+@pytest.fixture
+def rooms(monkeypatch):
+    # The server on its own room registry, with the background game loop and claim timer kept from
+    # running so they can't act for the humans mid-test
+    registry = RoomRegistry()
+    monkeypatch.setattr(server, "rooms", registry)
+    monkeypatch.setattr(server, "schedule_game", lambda room: None)
+    monkeypatch.setattr(server, "watch_claims", lambda room, window: None)
+    return registry
+
+@pytest.fixture
+def client(rooms):
+    return server.app.test_client()
+
+def test_discard_route(client, rooms, chi_and_pong):
+    room = rooms.create_room(3)
+    room.game = game = chi_and_pong
+    game.players[0].hand = hand_from_tiles(tiles(["3B", "9D"] + FILLER[:12]))
+    game.discard_pile.clear()
+    game.has_drawn = True
+
+    def discard(player_id, tile):
+        return client.post("/api/discard_tile", json={"room_id": room.id, "player_id": player_id, "tile": tile})
+
+    assert discard(1, "3B").status_code == 200
+    assert game.claims is not None
+    response = discard(1, "9D") # Refused while the claim window is open
+    assert response.status_code == 400 and sum(game.players[0].hand) == 13
+
+    client.post("/api/pass_chi", json={"room_id": room.id, "player_id": 2})
+    client.post("/api/pass_pong", json={"room_id": room.id, "player_id": 4})
+    assert game.claims is None and game.turn == 1 and not game.has_drawn
+    response = discard(2, "1B") # Refused before player 2 has drawn
+    assert response.status_code == 400 and sum(game.players[1].hand) == 13
@@ -0,0 +1,31 @@
+import pytest
+
+from game import Game
+from replay import Replay
+from server import step_game
+
+def state(game):
+    # Snapshot without the game id and published version, which a replay doesn't reproduce
+    snapshot = list(game.snapshot())
+    snapshot[0] = snapshot[17] = None
+    return snapshot
+
+@pytest.mark.parametrize("seed, human_players", [(seed, [[], [1], [1, 3], [2, 3, 4]][seed % 4]) for seed in range(8)])
+def test_replay_matches_every_state(seed, human_players):
+    # Humans pass on every claim and discard their last tile; every state on the way, open claim
+    # windows included, must come back from the log
+    game = Game(human_players=human_players, seed=seed)
+    game.deal_tiles()
+    states = {}
+    while not (game.winner or game.is_draw):
+        if game.claims is not None:
+            game.pass_pong(game.claims.waiting()[0])
+        elif not step_game(game) and not (game.winner or game.is_draw or game.claims):
+            player = game.players[game.turn]
+            game.discard_tile(player.id, player.hand_tiles()[-1])
+            game.open_claims(game.turn, game.last_discarded)
+        states[len(game.actions) // 3] = state(game)
+
+    replay = Replay.from_log(game.action_log())
+    for count, expected in states.items():
+        assert state(replay.state_at(count)) == expected
@@ -1,4 +1,4 @@
-import { useEffect, useState, useMemo } from "react";
+import { useEffect, useState, useMemo, useRef } from "react";
 import {io, Socket} from "socket.io-client";
 import { useLocation} from "react-router-dom";
 import { Link } from "react-router-dom";
@@ -18,6 +18,7 @@ type HumanPlayerInfo = {
   exposed: string[][];
   hand: string[];
   hand_count: number;
+  waits?: string[];
   possiblePong: string[];
   possibleChi: string[][];
 };
@@ -34,13 +35,67 @@ type GameStateResponse = {
   draw?: boolean;
   waiting?: boolean;
   needed?: number;
+  version?: number;
 };
 
+// Updates are either a full state or a delta against the version the client already has
+type GameStateUpdate = Partial<GameStateResponse> & {
+  delta?: boolean;
+  base_version?: number;
+  discard_pile_append?: string[];
+  removed?: string[];
+};
+
+function mergeUpdate(prev: GameStateResponse | null, update: GameStateUpdate): GameStateResponse | null {
+  if (!update.delta) return update as GameStateResponse;
+  if (!prev || prev.version !== update.base_version) return null; // Missed an update - resync
+  const next: Record<string, unknown> = { ...prev };
+  for (const key of update.removed || []) delete next[key];
+  for (const [key, value] of Object.entries(update)) {
+    if (["delta", "base_version", "discard_pile_append", "removed"].includes(key)) continue;
+    next[key] = value;
+  }
+  if (update.discard_pile_append) {
+    next.discard_pile = [...(prev.discard_pile || []), ...update.discard_pile_append];
+  }
+  return next as GameStateResponse;
+}
+
+// Seat saved in localStorage, so a player can get the same seat back in a room restored after a restart
+type SavedSeat = { roomId: string; playerId: number };
+
+function loadSavedSeat(key: string): SavedSeat | null {
+  try {
+    return JSON.parse(localStorage.getItem(key) || "null") as SavedSeat | null;
+  } catch {
+    return null;
+  }
+}
+
 type SkinColor = 'green' | 'red' | 'orange' | 'yellow' | 'blue' | 'pink';
 
 function Gamemode() {
   const { state } = useLocation();   
   const [playerId, setPlayerId] = useState<number | null>(null);
+  const [roomId, setRoomId] = useState<string | null>(null);
+  const [gameState, setGameState] = useState<GameStateResponse | null>(null);
+  const gameStateRef = useRef<GameStateResponse | null>(null);
+  const roomIdRef = useRef<string | null>(null);
+  const savedSeatKey = `mahjong-seat-${state.numHumans}`; // localStorage key of the seat to rejoin
+
+  const receiveUpdate = (update: GameStateUpdate) => {
+    const merged = mergeUpdate(gameStateRef.current, update);
+    if (merged === null) {
+      const since = gameStateRef.current?.version;
+      fetch(`${BACKEND}/api/game_state?room_id=${roomIdRef.current}` + (since !== undefined ? `&since=${since}` : ""))
+        .then((res) => res.json() as Promise<GameStateUpdate>)
+        .then((data) => receiveUpdate(data))
+        .catch((err) => console.error("Error resyncing game state:", err));
+      return;
+    }
+    gameStateRef.current = merged;
+    setGameState(merged);
+  };
   const [equippedSkin, setEquippedSkin] = useState<SkinColor>("green");
 
   const skinMap = useMemo<Record<SkinColor, string>>(() => ({
@@ -72,40 +127,39 @@ function Gamemode() {
   
   useEffect(() => {
     const socket: Socket = io(BACKEND, { transports: ["websocket"] });
-    console.log("Emitting join-game with:", state.numHumans);
-    
-    fetch(`${BACKEND}/api/game_state`)
-      .then((res) => res.json())
-      .then(async (data) => {
-        if (!data.waiting && data.needed === undefined) {
-          console.log("Existing game detected - calling rejoin API");
-          await fetch(`${BACKEND}/api/rejoin`, { method: "POST" });
-        } else {
-          console.log("No existing game - proceeding with join");
-        }
-      })
-      .then(() => {
-        console.log("Joining game");
-        socket.emit("join-game", { numHumans: state.numHumans });
-      })
-      .catch((err) => {
-        console.error("Error checking game state:", err);
-        socket.emit("join-game", { numHumans: state.numHumans });
-      });
-
-    socket.on("game-update", (payload) => {
+    // Rejoin the seat last played in, so a table restored after a server restart picks up where it left off
+    const savedSeat = state.roomId ? null : loadSavedSeat(savedSeatKey);
+    const rejoinRoomId = state.roomId ?? savedSeat?.roomId ?? null;
+    console.log("Emitting join-game with:", state.numHumans, rejoinRoomId);
+    socket.emit("join-game", { numHumans: state.numHumans, roomId: rejoinRoomId, playerId: savedSeat?.playerId });
+
+    // The server pushes every state change, so there is no need to poll
+    socket.on("game-update", (payload: GameStateUpdate) => {
       console.log("Received game-update:", payload);
+      receiveUpdate(payload);
     });
 
     socket.on("player-assigned", (data) => {
       console.log("Received player-assigned:", data);
       setPlayerId(data.player_id);
+      setRoomId(data.room_id);
+      roomIdRef.current = data.room_id;
+      localStorage.setItem(savedSeatKey, JSON.stringify({ roomId: data.room_id, playerId: data.player_id }));
+    });
+
+    socket.on("join-error", (data) => {
+      console.error("Could not join room:", data.error);
+      if (savedSeat) {
+        // The saved room has finished or the seat is taken: forget it and find a new table
+        localStorage.removeItem(savedSeatKey);
+        socket.emit("join-game", { numHumans: state.numHumans });
+      }
     });
 
     return () => {
       socket.disconnect();
     };
-  }, [state.numHumans]);
+  }, [state.numHumans, state.roomId, savedSeatKey]);
   
   const [handTiles, setHandTiles] = useState<string[]>([]);
   const [discardPile, setDiscardPile] = useState<string[]>([]);  
@@ -125,83 +179,81 @@ function Gamemode() {
   const [waitingForChiPong, setWaitingForChiPong] = useState<boolean>(false);
 
   useEffect(() => {
-    const intervalId = setInterval(() => {
-      fetch(`${BACKEND}/api/game_state`)
-        .then((res) => {
-          if (!res.ok) throw new Error(`HTTP ${res.status}`);
-          return res.json() as Promise<GameStateResponse>;
-        })
-        .then((data) => {
-          if (data.waiting) {
-            setWaiting(true);
-            setNeeded(data.needed || 0);
-            return;
-          }          
-          if (data.winner !== undefined) {
-            setWinner(data.winner);
-            setTai(data.tai || 0);
-            clearInterval(intervalId);
-            return;
-          }
-          if (data.draw) {
-            setDraw(true);
-            clearInterval(intervalId);
-            return;
-          }
-          
-          setWaiting(false);
-          setPlayers(data.players);
-          setAllPlayers(data.all_players);
-          
-          let currentPlayerData = null;
-          
-          if (playerId !== null) {
-            currentPlayerData = data.players.find(p => p.player_id === playerId);
-          }
-          
-          if (currentPlayerData) {
-            setHandTiles(currentPlayerData.hand);
-            setPossiblePong(currentPlayerData.possiblePong);
-            setPossibleChi(currentPlayerData.possibleChi);
-            const hasChiPongOptions = currentPlayerData.possiblePong.length > 0 || currentPlayerData.possibleChi.length > 0;
-            setWaitingForChiPong(hasChiPongOptions);
-            
-            if (playerId) {
-              console.log(`Player ${playerId} data:`, {
-                hand: currentPlayerData.hand,
-                possiblePong: currentPlayerData.possiblePong,
-                possibleChi: currentPlayerData.possibleChi,
-                currentTurn: data.current_turn,
-                isMyTurn: data.current_turn === playerId - 1,
-                waitingForChiPong: hasChiPongOptions
-              });
-            }
-          }
-          
-          setCurrentTurn(data.current_turn);
-          setDiscardPile(data.discard_pile || []);
-
-          if (data.drawn_tile && data.drawn_tile !== drawnTile) {
-            setDrawnTile(data.drawn_tile);
-          }
-        })
-        .catch((err) => {
-          setError(err.message);
-        })
-        .finally(() => {
-          setLoading(false);
-        });
-    }, 1000);
+    // Fetch one full snapshot when joining; later states arrive over the socket as deltas
+    if (roomId === null) return;
+    fetch(`${BACKEND}/api/game_state?room_id=${roomId}`)
+      .then((res) => {
+        if (!res.ok) throw new Error(`HTTP ${res.status}`);
+        return res.json() as Promise<GameStateUpdate>;
+      })
+      .then((data) => receiveUpdate(data))
+      .catch((err) => {
+        setError(err.message);
+      });
+  }, [roomId]);
+
+  useEffect(() => {
+    if (gameState === null) return;
+    const data = gameState;
+    setLoading(false);
 
-    return () => clearInterval(intervalId);
-  }, [drawnTile, playerId]);
+    if (data.waiting) {
+      setWaiting(true);
+      setNeeded(data.needed || 0);
+      return;
+    }          
+    if (data.winner !== undefined) {
+      localStorage.removeItem(savedSeatKey); // Finished games can't be rejoined
+      setWinner(data.winner);
+      setTai(data.tai || 0);
+      return;
+    }
+    if (data.draw) {
+      localStorage.removeItem(savedSeatKey);
+      setDraw(true);
+      return;
+    }
+    
+    setWaiting(false);
+    setPlayers(data.players);
+    setAllPlayers(data.all_players);
+    
+    let currentPlayerData = null;
+    
+    if (playerId !== null) {
+      currentPlayerData = data.players.find(p => p.player_id === playerId);
+    }
+    
+    if (currentPlayerData) {
+      setHandTiles(currentPlayerData.hand);
+      setPossiblePong(currentPlayerData.possiblePong);
+      setPossibleChi(currentPlayerData.possibleChi);
+      const hasChiPongOptions = currentPlayerData.possiblePong.length > 0 || currentPlayerData.possibleChi.length > 0;
+      setWaitingForChiPong(hasChiPongOptions);
+      
+      if (playerId) {
+        console.log(`Player ${playerId} data:`, {
+          hand: currentPlayerData.hand,
+          possiblePong: currentPlayerData.possiblePong,
+          possibleChi: currentPlayerData.possibleChi,
+          currentTurn: data.current_turn,
+          isMyTurn: data.current_turn === playerId - 1,
+          waitingForChiPong: hasChiPongOptions
+        });
+      }
+    }
+    
+    setCurrentTurn(data.current_turn);
+    setDiscardPile(data.discard_pile || []);
+    setDrawnTile(data.drawn_tile);
+  }, [gameState, playerId]);
 
   const doPong = async (tile: string) => {
     try {
       const res = await fetch(`${BACKEND}/api/pong`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ tile, player_id: playerId }),
+        body: JSON.stringify({ tile, player_id: playerId, room_id: roomId }),
       });
       const upd = await res.json();
       setHandTiles(upd.hand);
@@ -217,7 +269,7 @@ function Gamemode() {
       await await fetch(`${BACKEND}/api/pass_pong`, { 
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ player_id: playerId }),
+        body: JSON.stringify({ player_id: playerId, room_id: roomId }),
       });
       setPossiblePong([]);
       setWaitingForChiPong(false);
@@ -231,7 +283,7 @@ function Gamemode() {
       const res = await fetch(`${BACKEND}/api/chi`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ tiles: meld, player_id: playerId }),
+        body: JSON.stringify({ tiles: meld, player_id: playerId, room_id: roomId }),
       });
       const upd = await res.json();
       setHandTiles(upd.hand);
@@ -247,7 +299,7 @@ function Gamemode() {
       await fetch(`${BACKEND}/api/pass_chi`, { 
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ player_id: playerId }),
+        body: JSON.stringify({ player_id: playerId, room_id: roomId }),
       });
       setPossibleChi([]);
       setWaitingForChiPong(false);
@@ -277,7 +329,7 @@ function Gamemode() {
     fetch(`${BACKEND}/api/discard_tile`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ tile, player_id: playerId }),
+      body: JSON.stringify({ tile, player_id: playerId, room_id: roomId }),
     })
       .then((res) => res.json())
       .then((data) => {
@@ -295,26 +347,8 @@ function Gamemode() {
         setCurrentTurn(data.current_turn);
         
         if (data.message && data.message.includes("waiting for Chi/Pong")) {
-          console.log("Pong/Chi possible - fetching game state for options");
+          console.log("Pong/Chi possible - waiting for options from the server");
           setWaitingForChiPong(true); 
-          setTimeout(() => {
-            fetch(`${BACKEND}/api/game_state`)
-              .then((res) => res.json())
-              .then((gameData) => {
-                if (gameData.players) {
-                  const currentPlayerData = gameData.players.find((p: any) => p.player_id === playerId);
-                  if (currentPlayerData) {
-                    setPossiblePong(currentPlayerData.possiblePong || []);
-                    setPossibleChi(currentPlayerData.possibleChi || []);
-                    console.log("Updated Pong/Chi options:", {
-                      pong: currentPlayerData.possiblePong,
-                      chi: currentPlayerData.possibleChi
-                    });
-                  }
-                }
-              })
-              .catch((err) => console.error("Error fetching game state:", err));
-          }, 100); 
         }
       })
       .catch((err) => {
@@ -10,29 +10,9 @@ function Homepage() {
   const [showOtherGames, setShowOtherGames] = useState(false);
   const [showSkins, setShowSkins] = useState(false);
 
-  const handlePlay = async (numHumans: number) => {
-    try {
-      const res = await fetch("/api/game_state");
-      if (!res.ok) throw new Error(`HTTP ${res.status}`);
-      const data = await res.json();
-
-      if (!data.waiting && data.needed === undefined) {
-        console.log("Existing game detected - calling rejoin API");
-        await fetch("/api/rejoin", { method: "POST" });
-        console.log("Game state reset for rejoin");
-      } else {
-        console.log("No existing game - proceeding with fresh start");
-      }
-
-      if (data.winner !== undefined || data.draw) {
-        await fetch("/api/reset", { method: "POST" });
-        console.log("Game was finished—resetting before new round.");
-      }
-    } catch (err) {
-      console.error("Error starting game:", err);
-    } finally {
-      navigate("/gamemode", { state: { numHumans } });
-    }
+  const handlePlay = (numHumans: number) => {
+    // The server matchmakes each join into its own room, so there is no shared game to reset
+    navigate("/gamemode", { state: { numHumans } });
   };
 
   const handleSignOut = async (e: MouseEvent<HTMLParagraphElement>) => {